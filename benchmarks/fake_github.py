@@ -0,0 +1,277 @@
+"""Sustituto local de la Contents API de GitHub para pruebas de carga y CI.
+
+Implementa lo que usa ``GitHubClient``:
+
+* ``GET /repos/<owner>/<repo>/contents/<ruta>?ref=<rama>`` con ``ETag`` y
+  ``304 Not Modified`` si coincide ``If-None-Match``.
+* ``PUT`` de la misma ruta con ``content`` en base64 y ``sha``: crea (201) o
+  actualiza (200); responde 409 si el SHA está obsoleto y 422 si falta al
+  actualizar un fichero existente.
+
+Los documentos se guardan en memoria, por repositorio y rama, con el mismo
+SHA de blob que calcularía git. Se puede añadir latencia a cada petición y
+un límite de peticiones con las cabeceras ``X-RateLimit-*``; las respuestas
+304 no cuentan para el límite, igual que en GitHub. ``GET /_stats`` devuelve
+el número de peticiones por método y código de estado.
+
+Uso::
+
+    python benchmarks/fake_github.py --port 8700 --seed-dir . --latency 0.05
+    GITHUB_API_URL=http://127.0.0.1:8700 GITHUB_TOKEN=x GITHUB_REPO=prueba/vacaciones \\
+        streamlit run registro_vacaciones5.py
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_REPO = "prueba/vacaciones"
+DEFAULT_BRANCH = "main"
+
+
+def blob_sha(content):
+    """SHA de blob de git para ``content`` (bytes)"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class RateLimiter:
+    """Límite de peticiones por ventana de tiempo, como el de la API de GitHub"""
+
+    def __init__(self, limit, window=3600):
+        self.limit = limit
+        self.window = window
+        self._reset_at = time.time() + window
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def take(self, count=True):
+        """Anotar una petición; devuelve ``(permitida, cabeceras)``"""
+        with self._lock:
+            now = time.time()
+            if now >= self._reset_at:
+                self._reset_at = now + self.window
+                self._used = 0
+            allowed = self._used < self.limit
+            if allowed and count:
+                self._used += 1
+            headers = {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": str(max(0, self.limit - self._used)),
+                "X-RateLimit-Used": str(self._used),
+                "X-RateLimit-Reset": str(int(self._reset_at)),
+            }
+            return allowed, headers
+
+
+class FakeGitHub:
+    """Servidor de la Contents API en memoria, en un hilo propio"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, rate_limit=None, rate_window=3600):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limiter = RateLimiter(rate_limit, rate_window) if rate_limit else None
+        # (repo, rama, ruta) → (contenido, sha)
+        self.files = {}
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def seed(self, path, content, repo=DEFAULT_REPO, branch=DEFAULT_BRANCH):
+        """Crear o sustituir un fichero sin pasar por HTTP"""
+        if not isinstance(content, bytes):
+            content = content.encode()
+        with self._lock:
+            self.files[(repo, branch, path)] = (content, blob_sha(content))
+
+    def seed_dir(self, directory, repo=DEFAULT_REPO, branch=DEFAULT_BRANCH):
+        """Cargar los JSON de ``directory`` (y de su subdirectorio ``users``) como ficheros del repositorio"""
+        root = Path(directory)
+        for file in [*root.glob("*.json"), *root.glob("users/*.json")]:
+            self.seed(file.relative_to(root).as_posix(), file.read_bytes(), repo, branch)
+
+    def snapshot(self):
+        """Copia de los contadores de peticiones"""
+        with self._lock:
+            return Counter(self.stats)
+
+    def _count(self, method, status):
+        with self._lock:
+            self.stats[f"{method} {status}"] += 1
+            self.stats[method] += 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload=None, headers=None):
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if payload is not None:
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                fake._count(self.command, int(status))
+
+            def _route(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip("/").split("/", 4)
+                if len(parts) < 5 or parts[0] != "repos" or parts[3] != "contents":
+                    return None
+                return f"{parts[1]}/{parts[2]}", unquote(parts[4]), parse_qs(url.query)
+
+            def _admit(self, count=True):
+                """Latencia simulada y límite de peticiones; devuelve las cabeceras o None si se rechaza"""
+                delay = fake.latency + random.uniform(0, fake.jitter) if fake.jitter else fake.latency
+                if delay:
+                    time.sleep(delay)
+                if fake.rate_limiter is None:
+                    return {}
+                allowed, headers = fake.rate_limiter.take(count)
+                if not allowed:
+                    self._send(HTTPStatus.FORBIDDEN, {"message": "API rate limit exceeded"}, headers)
+                    return None
+                return headers
+
+            def do_GET(self):
+                if self.path.startswith("/_stats"):
+                    self._send(HTTPStatus.OK, dict(fake.snapshot()))
+                    return
+                if self.headers.get("Authorization") is None:
+                    self._send(HTTPStatus.UNAUTHORIZED, {"message": "Requires authentication"})
+                    return
+                route = self._route()
+                if route is None:
+                    self._send(HTTPStatus.NOT_FOUND, {"message": "Not Found"})
+                    return
+                repo, path, query = route
+                branch = query.get("ref", [DEFAULT_BRANCH])[0]
+                with fake._lock:
+                    stored = fake.files.get((repo, branch, path))
+
+                etag = f'"{stored[1]}"' if stored else None
+                not_modified = stored is not None and self.headers.get("If-None-Match") == etag
+                headers = self._admit(count=not not_modified)
+                if headers is None:
+                    return
+                if stored is None:
+                    self._send(HTTPStatus.NOT_FOUND, {"message": "Not Found"}, headers)
+                    return
+                headers["ETag"] = etag
+                if not_modified:
+                    self._send(HTTPStatus.NOT_MODIFIED, None, headers)
+                    return
+                content, sha = stored
+                self._send(HTTPStatus.OK, {
+                    "type": "file",
+                    "encoding": "base64",
+                    "name": path.rsplit("/", 1)[-1],
+                    "path": path,
+                    "sha": sha,
+                    "size": len(content),
+                    "content": base64.encodebytes(content).decode(),
+                }, headers)
+
+            def do_PUT(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.headers.get("Authorization") is None:
+                    self._send(HTTPStatus.UNAUTHORIZED, {"message": "Requires authentication"})
+                    return
+                route = self._route()
+                if route is None or "content" not in payload or "message" not in payload:
+                    self._send(HTTPStatus.UNPROCESSABLE_ENTITY, {"message": "Invalid request"})
+                    return
+                headers = self._admit()
+                if headers is None:
+                    return
+                repo, path, _ = route
+                key = (repo, payload.get("branch", DEFAULT_BRANCH), path)
+                content = base64.b64decode(payload["content"])
+                with fake._lock:
+                    current = fake.files.get(key)
+                    if current is not None and "sha" not in payload:
+                        status, error = HTTPStatus.UNPROCESSABLE_ENTITY, "\"sha\" wasn't supplied."
+                    elif payload.get("sha") is not None and (current is None or current[1] != payload["sha"]):
+                        status, error = HTTPStatus.CONFLICT, f"{path} does not match {payload['sha']}"
+                    else:
+                        status, error = (HTTPStatus.OK if current is not None else HTTPStatus.CREATED), None
+                        sha = blob_sha(content)
+                        fake.files[key] = (content, sha)
+                if error is not None:
+                    self._send(status, {"message": error}, headers)
+                    return
+                self._send(status, {
+                    "content": {"name": path.rsplit("/", 1)[-1], "path": path, "sha": sha, "size": len(content)},
+                    "commit": {"message": payload["message"]},
+                }, headers)
+
+        return Handler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sustituto local de la Contents API de GitHub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--seed-dir", type=Path, help="Directorio con los JSON iniciales (users.json, vacation_data_*.json)")
+    parser.add_argument("--repo", default=DEFAULT_REPO, help="Repositorio en el que cargar --seed-dir")
+    parser.add_argument("--branch", default=DEFAULT_BRANCH)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por petición")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Espera aleatoria adicional máxima, en segundos")
+    parser.add_argument("--rate-limit", type=int, help="Peticiones permitidas por ventana")
+    parser.add_argument("--rate-window", type=int, default=3600, help="Duración de la ventana en segundos")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fake = FakeGitHub(args.host, args.port, args.latency, args.jitter, args.rate_limit, args.rate_window)
+    if args.seed_dir:
+        fake.seed_dir(args.seed_dir, args.repo, args.branch)
+    print(f"Contents API en {fake.url} ({len(fake.files)} ficheros)")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
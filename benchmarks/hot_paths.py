@@ -0,0 +1,348 @@
+"""Benchmarks de las rutas críticas de la aplicación con usuarios sintéticos.
+
+Mide la decodificación del documento, festivos, eventos del calendario,
+edición por rangos, importación, feed iCalendar, informe PDF (con
+``horas_registro.pdf``) y matriz del equipo (``TEAM_SIZE`` usuarios) para
+cada perfil de ``synthetic.PROFILES``. Guarda los resultados en JSON y los
+compara con una línea base: si alguna ruta es más lenta que la base más la
+tolerancia, termina con código 1. No usa la red.
+
+Uso::
+
+    python benchmarks/hot_paths.py                      # comparar con la base
+    python benchmarks/hot_paths.py --update-baseline    # guardar una base nueva
+    python benchmarks/hot_paths.py --filter pdf --output resultados.json --no-baseline
+
+Sin línea base termina con código 1, salvo con ``--no-baseline``.
+
+La base depende de la máquina: genérala en la misma máquina en la que se
+comparan los resultados.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic import PROFILES, REFERENCE_YEAR, import_csv, vacation_document  # noqa: E402
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+
+# Un benchmark es más lento si supera la base en esta proporción...
+TOLERANCE = 0.25
+# ...y además en este número de milisegundos (evita falsos positivos por ruido)
+MIN_REGRESSION_MS = 0.05
+
+REPEAT = 5
+
+# Usuarios de la matriz de disponibilidad del equipo
+TEAM_SIZE = 300
+
+
+def _holidays_cold(vacation_data):
+    from vacaciones.holiday_calendar import HolidayCalendar, _parse_custom, official_holidays
+
+    years = range(REFERENCE_YEAR - 1, REFERENCE_YEAR + 2)
+
+    def run():
+        official_holidays.cache_clear()
+        _parse_custom.cache_clear()
+        return len(HolidayCalendar(years, vacation_data["custom_holidays"]))
+    return run
+
+
+def _holidays_warm(vacation_data):
+    from vacaciones.holiday_calendar import HolidayCalendar
+
+    years = range(REFERENCE_YEAR - 1, REFERENCE_YEAR + 2)
+    return lambda: len(HolidayCalendar(years, vacation_data["custom_holidays"]))
+
+
+def _decode(vacation_data):
+    from vacaciones.document import VacationDocument
+
+    return lambda: VacationDocument.from_dict(vacation_data)
+
+
+def _encode(vacation_data):
+    from vacaciones.document import VacationDocument
+
+    document = VacationDocument.from_dict(vacation_data)
+    return document.encode
+
+
+def _calendar_events(vacation_data):
+    from vacaciones.document import VacationDocument
+    from vacaciones.events import create_calendar_events
+
+    document = VacationDocument.from_dict(vacation_data)
+    return lambda: create_calendar_events(document, REFERENCE_YEAR)
+
+
+def _derived_state(vacation_data):
+    from vacaciones.derived import DerivedState
+    from vacaciones.document import VacationDocument
+
+    start, end = date(REFERENCE_YEAR, 1, 1), date(REFERENCE_YEAR + 1, 1, 1)
+    document = VacationDocument.from_dict(vacation_data)
+
+    def run():
+        state = DerivedState(document)
+        return state.balance(REFERENCE_YEAR).remaining, state.events_between(start, end)
+    return run
+
+
+def _toggle_day(vacation_data):
+    from vacaciones.derived import DerivedState
+    from vacaciones.document import VacationDocument
+
+    document = VacationDocument.from_dict(vacation_data)
+    state = DerivedState(document)
+    state.year(REFERENCE_YEAR)
+    day = date(REFERENCE_YEAR, 12, 22)
+
+    def run():
+        # Cada cambio se guarda: se codifica el documento como en la aplicación
+        state.add_day(day)
+        document.encode()
+        state.commit()
+        state.remove_day(day)
+        document.encode()
+        state.commit()
+    return run
+
+
+def _balance(vacation_data):
+    from vacaciones.balances import BalancePolicy
+    from vacaciones.derived import DerivedState
+    from vacaciones.document import VacationDocument
+
+    state = DerivedState(VacationDocument.from_dict(vacation_data), BalancePolicy(carry_over_max=5))
+    day = date(REFERENCE_YEAR, 2, 3)
+
+    def run():
+        # Cada cambio invalida el traspaso de ese año y los siguientes
+        state.add_day(day)
+        state.balance(REFERENCE_YEAR + 1)
+        state.remove_day(day)
+        return state.balance(REFERENCE_YEAR + 1).remaining
+    return run
+
+
+def _range_add(vacation_data):
+    from vacaciones.business_days import BusinessCalendar
+    from vacaciones.day_set import DaySet
+    from vacaciones.holiday_calendar import HolidayCalendar
+
+    start, end = date(REFERENCE_YEAR, 7, 1), date(REFERENCE_YEAR, 8, 31)
+
+    def run():
+        used_days = DaySet.from_iso(vacation_data["used_days"])
+        holidays = HolidayCalendar(range(start.year, end.year + 1), vacation_data["custom_holidays"])
+        new_days = DaySet.from_datetime64(BusinessCalendar(holidays).days(start, end)) - used_days
+        return (used_days | new_days).to_iso()
+    return run
+
+
+def _range_remove(vacation_data):
+    from vacaciones.day_set import DaySet
+
+    start, end = date(REFERENCE_YEAR, 1, 1), date(REFERENCE_YEAR, 6, 30)
+
+    def run():
+        used_days = DaySet.from_iso(vacation_data["used_days"])
+        return (used_days - DaySet.from_range(start, end)).to_iso()
+    return run
+
+
+def _import_csv(vacation_data):
+    from vacaciones.importing import import_file
+
+    payload = import_csv(vacation_data)
+    return lambda: import_file(io.BytesIO(payload), "historial.csv")
+
+
+def _ics_feed(vacation_data):
+    from vacaciones.document import VacationDocument
+    from vacaciones.ics_feed import build_feed, feed_years
+
+    document = VacationDocument.from_dict(vacation_data)
+    years = feed_years(document, date(REFERENCE_YEAR, 6, 1))
+    return lambda: build_feed(document, years)
+
+
+def _pdf_report(vacation_data):
+    from vacaciones.document import VacationDocument
+    from vacaciones.holiday_calendar import HolidayCalendar
+    from vacaciones.report import TEMPLATE_FILE, load_template, render_report
+
+    selected_month = date(REFERENCE_YEAR, 3, 1)
+    document = VacationDocument.from_dict(vacation_data)
+    holidays = HolidayCalendar(REFERENCE_YEAR, document.holiday_map())
+    layout = load_template(str(ROOT / TEMPLATE_FILE))
+    return lambda: render_report(selected_month, document, holidays, layout)
+
+
+def _team_matrix(vacation_data):
+    from vacaciones.team import TeamYear
+
+    used_days = {f"usuario{index:03d}": vacation_data["used_days"] for index in range(TEAM_SIZE)}
+    return lambda: TeamYear(REFERENCE_YEAR, used_days)
+
+
+def _team_update(vacation_data):
+    from vacaciones.team import TeamYear
+
+    team_year = TeamYear(REFERENCE_YEAR, {f"usuario{index:03d}": vacation_data["used_days"] for index in range(TEAM_SIZE)})
+    start, end = date(REFERENCE_YEAR, 7, 1), date(REFERENCE_YEAR, 8, 1)
+
+    def run():
+        team_year.set_row("usuario000", vacation_data["used_days"])
+        return team_year.between(start, end)[1].sum(axis=0)
+    return run
+
+
+def _team_overlaps(vacation_data):
+    from vacaciones.team import AbsenceIndex
+
+    index = AbsenceIndex()
+    for number in range(TEAM_SIZE):
+        index.update(f"usuario{number:03d}", vacation_data["used_days"])
+    days = [(date(REFERENCE_YEAR, 7, 1) + timedelta(days=offset)).isoformat() for offset in range(62)]
+    among = {f"usuario{number:03d}" for number in range(0, TEAM_SIZE, 3)}
+    return lambda: index.overlaps("usuario000", days, among)
+
+
+# Nombre → constructor que recibe el documento y devuelve la función a medir
+BENCHMARKS = {
+    "holidays.cold": _holidays_cold,
+    "holidays.warm": _holidays_warm,
+    "document.decode": _decode,
+    "document.encode": _encode,
+    "events.create": _calendar_events,
+    "events.derived_state": _derived_state,
+    "events.toggle_day": _toggle_day,
+    "balance.toggle_day": _balance,
+    "range.add": _range_add,
+    "range.remove": _range_remove,
+    "import.csv": _import_csv,
+    "ics.feed": _ics_feed,
+    "pdf.report": _pdf_report,
+    "team.matrix": _team_matrix,
+    "team.update": _team_update,
+    "team.overlaps": _team_overlaps,
+}
+
+
+def measure(func):
+    """Tiempo por llamada en ms: mínimo y mediana de ``REPEAT`` series"""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    times = [elapsed / loops * 1000 for elapsed in timer.repeat(repeat=REPEAT, number=loops)]
+    return {"min_ms": round(min(times), 4), "median_ms": round(statistics.median(times), 4), "loops": loops}
+
+
+def machine_info():
+    import numpy
+
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": numpy.__version__,
+    }
+    try:
+        import fitz
+
+        info["pymupdf"] = fitz.VersionBind
+    except ImportError:
+        pass
+    return info
+
+
+def run(selected=None):
+    results = {}
+    for profile in PROFILES:
+        vacation_data = vacation_document(profile)
+        for name, build in BENCHMARKS.items():
+            key = f"{name}[{profile}]"
+            if selected and selected not in key:
+                continue
+            results[key] = measure(build(vacation_data))
+            print(f"{key:<34} {results[key]['min_ms']:10.3f} ms  (mediana {results[key]['median_ms']:.3f} ms)")
+    return {"machine": machine_info(), "results": results}
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Benchmarks más lentos que la base: ``[(nombre, base_ms, actual_ms)]``"""
+    regressions = []
+    for key, result in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            continue
+        base_ms, now_ms = reference["min_ms"], result["min_ms"]
+        if now_ms > base_ms * (1 + tolerance) and now_ms - base_ms > MIN_REGRESSION_MS:
+            regressions.append((key, base_ms, now_ms))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas críticas")
+    parser.add_argument("--filter", help="Medir solo los benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--output", type=Path, help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Línea base con la que comparar")
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar los resultados como nueva base")
+    parser.add_argument(
+        "--no-baseline", action="store_true",
+        help="Solo medir: no fallar si no hay línea base con la que comparar"
+    )
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Empeoramiento admitido (0.25 = 25%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    current = run(args.filter)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2) + "\n")
+
+    if args.update_baseline:
+        if args.filter and args.baseline.exists():
+            # Con --filter solo se actualizan los benchmarks medidos
+            baseline = json.loads(args.baseline.read_text())
+            baseline["results"].update(current["results"])
+            baseline["machine"] = current["machine"]
+            current = baseline
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        if args.no_baseline:
+            return 0
+        # Sin base no se compara nada: fallar para que no pase como "sin regresiones"
+        print(f"ERR no hay línea base en {args.baseline}; créala con --update-baseline", file=sys.stderr)
+        return 1
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("machine") != current["machine"]:
+        print("Aviso: la línea base se midió en otra máquina o con otras versiones", file=sys.stderr)
+    regressions = compare(current, baseline, args.tolerance)
+    for key, base_ms, now_ms in regressions:
+        print(f"ERR {key}: {base_ms:.3f} ms → {now_ms:.3f} ms (+{(now_ms / base_ms - 1) * 100:.0f}%)", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} benchmarks más lentos que la línea base", file=sys.stderr)
+        return 1
+    print("Sin regresiones respecto a la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
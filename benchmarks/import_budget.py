@@ -0,0 +1,90 @@
+"""Comprobar el tiempo de importación de la librería ``vacaciones``.
+
+Cada módulo se importa en un intérprete nuevo con ``-X importtime`` y se
+toma el mejor de varios intentos. Además se comprueba que importar el
+módulo no arrastra dependencias pesadas, que solo deben cargarse al
+generar un informe o usar una ruta vectorizada. Los módulos de esas rutas
+(``ALLOWED_HEAVY``) también se miden, para que no pase desapercibido que
+otro módulo los importe al cargarse.
+
+Uso::
+
+    python benchmarks/import_budget.py
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Módulo → presupuesto en milisegundos (importación acumulada del módulo)
+BUDGET_MS = {
+    "vacaciones": 5,
+    "vacaciones.balances": 10,
+    "vacaciones.business_days": 200,
+    "vacaciones.changelog": 50,
+    "vacaciones.day_set": 200,
+    "vacaciones.derived": 20,
+    "vacaciones.document": 50,
+    "vacaciones.events": 20,
+    "vacaciones.holiday_calendar": 20,
+    "vacaciones.importing": 20,
+    "vacaciones.ics_feed": 30,
+    "vacaciones.metrics": 50,
+    "vacaciones.storage": 50,
+    "vacaciones.team": 50,
+    "vacaciones.users": 50,
+    "vacaciones.write_behind": 50,
+    "vacaciones.report": 60,
+    "vacaciones.bulk_reports": 120,
+}
+
+HEAVY_MODULES = ["fitz", "pymupdf", "pandas", "numpy", "streamlit", "requests", "holidays", "babel"]
+
+# Módulos de las rutas vectorizadas: pueden importar estas dependencias
+ALLOWED_HEAVY = {
+    "vacaciones.business_days": {"numpy"},
+    "vacaciones.day_set": {"numpy"},
+}
+
+RUNS = 5
+
+
+def import_time_ms(module):
+    """Mejor tiempo acumulado de importación de ``module`` en ``RUNS`` intérpretes nuevos"""
+    best = None
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                cumulative = int(parts[1]) / 1000
+                best = cumulative if best is None else min(best, cumulative)
+    return best
+
+
+def heavy_imports(module):
+    """Dependencias pesadas presentes en ``sys.modules`` tras importar ``module``"""
+    code = f"import json, sys, {module}; print(json.dumps(sorted(set(sys.modules) & set({HEAVY_MODULES!r}))))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    failed = False
+    for module, budget in BUDGET_MS.items():
+        elapsed = import_time_ms(module)
+        heavy = [name for name in heavy_imports(module) if name not in ALLOWED_HEAVY.get(module, ())]
+        ok = elapsed <= budget and not heavy
+        failed |= not ok
+        note = f"  importa {', '.join(heavy)}" if heavy else ""
+        print(f"{'OK ' if ok else 'ERR'} {module:<28} {elapsed:7.1f} ms / {budget} ms{note}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
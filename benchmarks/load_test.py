@@ -0,0 +1,256 @@
+"""Prueba de carga con sesiones simultáneas contra el sustituto de la API de GitHub.
+
+Arranca ``fake_github.FakeGitHub`` (o usa ``--api-url``), registra usuarios
+sintéticos y ejecuta ``registro_vacaciones5.py`` con ``AppTest``, una sesión
+por usuario. Todas las sesiones hacen a la vez cada operación (abrir, iniciar
+sesión, añadir un día, quitarlo, generar el informe); entre operación y
+operación se espera a que terminen todas, de modo que las peticiones a la API
+de cada fase se atribuyen a su operación.
+
+``AppTest`` no admite varias ejecuciones simultáneas en un mismo proceso, así
+que las sesiones se reparten entre ``--workers`` procesos; cada proceso hace
+como un servidor de Streamlit: atiende a sus sesiones una tras otra y estas
+comparten sus recursos de ``st.cache_resource`` (backend, caché de lecturas,
+buffer de escritura). La latencia de cada operación es la de su ejecución,
+sin la espera por las demás sesiones del mismo proceso.
+
+Muestra los percentiles de latencia y las peticiones a la API por operación.
+
+Uso::
+
+    python benchmarks/load_test.py --sessions 50
+    python benchmarks/load_test.py --sessions 200 --workers 16 --latency 0.08 --json carga.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_github import DEFAULT_REPO, FakeGitHub  # noqa: E402
+from synthetic import PROFILES, REFERENCE_YEAR, vacation_document  # noqa: E402
+
+SCRIPT = ROOT / "registro_vacaciones5.py"
+PASSWORD = "carga1234"
+OPERATIONS = ("abrir", "login", "añadir_día", "quitar_día", "informe")
+
+
+def seed_users(api_url, count, profile):
+    """Registrar ``count`` usuarios con su documento de vacaciones a través de la API"""
+    from vacaciones.storage import GitHubClient, GitHubStorage
+    from vacaciones.users import UserRegistry, hash_password
+
+    backend = GitHubStorage(GitHubClient("carga", DEFAULT_REPO, api_url=api_url))
+    registry = UserRegistry(backend)
+    usernames = []
+    for index in range(count):
+        username = f"carga{index:04d}"
+        vacation_data = vacation_document(profile, seed=index)
+        registry.create(username, {
+            "password": hash_password(PASSWORD),
+            "full_name": vacation_data["full_name"],
+            "nif": vacation_data["nif"],
+            "workplace": vacation_data["workplace"],
+            "company": vacation_data["company"],
+        })
+        backend.save(f"vacation_data_{username}.json", vacation_data, "Datos de carga")
+        usernames.append(username)
+    return usernames
+
+
+def _click(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+
+
+def _operations(at, username, day):
+    def open_app():
+        at.run()
+
+    def login():
+        at.text_input[0].input(username)
+        at.text_input[1].input(PASSWORD)
+        at.button[0].click().run()
+
+    def add_day():
+        # Clic en el calendario y después en el botón
+        at.session_state["selected_date"] = day
+        at.run()
+        _click(at, "✅ Añadir como Vacaciones")
+
+    def remove_day():
+        at.run()
+        _click(at, "❌ Eliminar Vacaciones")
+
+    def report():
+        _click(at, "Generar Informe PDF")
+
+    return dict(zip(OPERATIONS, (open_app, login, add_day, remove_day, report)))
+
+
+def run_worker(sessions, barrier, results, timeout):
+    """Ejecutar las sesiones ``[(índice, usuario)]`` fase a fase, sincronizado con el resto de procesos"""
+    from streamlit.testing.v1 import AppTest
+
+    latencies = defaultdict(list)
+    errors = defaultdict(list)
+    try:
+        apps = []
+        for index, username in sessions:
+            at = AppTest.from_file(str(SCRIPT), default_timeout=timeout)
+            day = date(REFERENCE_YEAR, 12, 1 + index % 28).isoformat()
+            apps.append((username, at, _operations(at, username, day)))
+
+        failed = set()
+        for name in OPERATIONS:
+            barrier.wait()
+            for username, at, operations in apps:
+                if username in failed:
+                    continue
+                start = time.perf_counter()
+                try:
+                    operations[name]()
+                except Exception as e:
+                    errors[name].append(f"{username}: {e}")
+                    failed.add(username)
+                else:
+                    if at.exception:
+                        errors[name].append(f"{username}: {at.exception[0].message}")
+                        failed.add(username)
+                latencies[name].append(time.perf_counter() - start)
+            barrier.wait()
+    except Exception:
+        # Sin esto el resto de procesos esperarían indefinidamente en la barrera
+        barrier.abort()
+        raise
+    finally:
+        results.put((dict(latencies), dict(errors)))
+
+
+def percentiles(samples):
+    """p50, p90, p95, p99 y máximo en milisegundos"""
+    samples = sorted(samples)
+    if len(samples) == 1:
+        return dict.fromkeys(("p50", "p90", "p95", "p99", "max"), samples[0] * 1000)
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p90": cuts[89] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": samples[-1] * 1000,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la aplicación con sesiones simultáneas")
+    parser.add_argument("--sessions", type=int, default=50, help="Sesiones simultáneas")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos entre los que repartir las sesiones")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="tipico", help="Perfil de los usuarios sintéticos")
+    parser.add_argument("--api-url", help="Usar esta API en lugar de arrancar el sustituto local")
+    parser.add_argument("--latency", type=float, default=0.03, help="Latencia simulada de la API, en segundos")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Latencia aleatoria adicional máxima")
+    parser.add_argument("--rate-limit", type=int, help="Límite de peticiones por hora de la API simulada")
+    parser.add_argument("--write-delay", type=float, default=0, help="WRITE_BEHIND_DELAY de la aplicación")
+    parser.add_argument("--timeout", type=float, default=300, help="Tiempo máximo de cada ejecución del script")
+    parser.add_argument("--json", type=Path, help="Guardar los resultados en este fichero")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fake = None
+    api_url = args.api_url
+    if api_url is None:
+        fake = FakeGitHub(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit).start()
+        api_url = fake.url
+
+    os.environ.update({
+        "STORAGE_BACKEND": "github",
+        "GITHUB_TOKEN": "carga",
+        "GITHUB_REPO": DEFAULT_REPO,
+        "GITHUB_API_URL": api_url,
+        "WRITE_BEHIND_DELAY": str(args.write_delay),
+    })
+    # El informe se genera con rutas relativas a la raíz del repositorio
+    os.chdir(ROOT)
+
+    print(f"Registrando {args.sessions} usuarios ({args.profile}) en {api_url}...")
+    usernames = seed_users(api_url, args.sessions, args.profile)
+
+    workers = max(1, min(args.workers, args.sessions))
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    queue = context.Queue()
+    sessions = list(enumerate(usernames))
+    processes = [
+        context.Process(target=run_worker, args=(sessions[worker::workers], barrier, queue, args.timeout))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    phases = {}
+    try:
+        for name in OPERATIONS:
+            before = fake.snapshot() if fake else None
+            barrier.wait()
+            started = time.perf_counter()
+            barrier.wait()
+            phases[name] = (time.perf_counter() - started, fake.snapshot() - before if fake else None)
+    except threading.BrokenBarrierError:
+        print("Un proceso de la prueba ha fallado; resultados incompletos", file=sys.stderr)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(list)
+    for _ in processes:
+        worker_latencies, worker_errors = queue.get()
+        for name, samples in worker_latencies.items():
+            latencies[name].extend(samples)
+        for name, messages in worker_errors.items():
+            errors[name].extend(messages)
+    for process in processes:
+        process.join()
+    if fake:
+        fake.stop()
+
+    results = {}
+    for name, (elapsed, requests) in phases.items():
+        result = {"sessions": len(latencies[name]), "errors": len(errors[name]), "wall_s": elapsed}
+        result.update(percentiles(latencies[name]) if latencies[name] else {})
+        if requests is not None:
+            result["api_requests"] = {key: value for key, value in sorted(requests.items()) if " " in key}
+            result["api_per_session"] = (requests["GET"] + requests["PUT"]) / max(1, len(latencies[name]))
+        results[name] = result
+
+    print(f"\n{'operación':<12} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'máx':>8}  {'API/sesión':>10}  errores")
+    for name, result in results.items():
+        if "p50" not in result:
+            print(f"{name:<12} sin datos  errores {result['errors']}")
+            continue
+        print(
+            f"{name:<12} {result['p50']:8.0f} {result['p90']:8.0f} {result['p95']:8.0f} {result['p99']:8.0f} "
+            f"{result['max']:8.0f}  {result.get('api_per_session', 0):10.1f}  {result['errors']}"
+        )
+        if result.get("api_requests"):
+            print(f"{'':<12} {', '.join(f'{key}: {value}' for key, value in result['api_requests'].items())}")
+    print("(latencias en ms)")
+    for name, messages in errors.items():
+        for message in messages[:3]:
+            print(f"ERR {name}: {message}", file=sys.stderr)
+
+    if args.json:
+        args.json.write_text(json.dumps({"sessions": args.sessions, "profile": args.profile, "operations": results}, indent=2) + "\n")
+    return 1 if any(errors.values()) or len(phases) < len(OPERATIONS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
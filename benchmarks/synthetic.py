@@ -0,0 +1,70 @@
+"""Usuarios sintéticos para los benchmarks.
+
+Cada perfil genera un documento de vacaciones determinista (misma semilla,
+mismos datos) con el formato de ``vacation_data_<usuario>.json``.
+"""
+import random
+from datetime import date, timedelta
+
+# Perfil → (años de historial, días de vacaciones por año, festivos personalizados)
+PROFILES = {
+    "minimo": (1, 5, 0),
+    "tipico": (2, 23, 4),
+    "veterano": (12, 25, 300),
+}
+
+REFERENCE_YEAR = 2025
+
+
+def _weekdays(year):
+    day = date(year, 1, 1)
+    while day.year == year:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def vacation_document(profile, seed=0, last_year=REFERENCE_YEAR):
+    """Documento de vacaciones del perfil ``profile``"""
+    years, days_per_year, custom_count = PROFILES[profile]
+    rng = random.Random(f"{profile}-{seed}")
+    first_year = last_year - years + 1
+
+    used_days = []
+    for year in range(first_year, last_year + 1):
+        weekdays = list(_weekdays(year))
+        # Un bloque de verano y el resto repartido por el año, como en la realidad
+        summer_start = rng.randrange(130, 160)
+        summer = weekdays[summer_start:summer_start + min(10, days_per_year)]
+        rest = rng.sample(weekdays, days_per_year)
+        used_days.extend(sorted({*summer, *rest})[:days_per_year])
+
+    custom_holidays = []
+    for index in range(custom_count):
+        year = rng.randint(first_year, last_year)
+        day = date(year, 1, 1) + timedelta(days=rng.randrange(365))
+        if index % 10 == 0:
+            # Formato antiguo: solo la fecha
+            custom_holidays.append(day.isoformat())
+        else:
+            custom_holidays.append({"date": day.isoformat(), "name": f"Festivo local {index}"})
+
+    return {
+        "total_days": days_per_year,
+        "used_days": sorted(day.isoformat() for day in used_days),
+        "custom_holidays": custom_holidays,
+        "full_name": f"Usuario {profile}",
+        "nif": "00000000T",
+        "workplace": "Madrid",
+        "company": "Empresa de prueba",
+    }
+
+
+def import_csv(vacation_data):
+    """El historial del documento como CSV de otra herramienta de RR. HH."""
+    lines = ["fecha;tipo;nombre"]
+    lines += [f"{day[8:10]}/{day[5:7]}/{day[:4]};vacaciones;" for day in vacation_data["used_days"]]
+    for holiday in vacation_data["custom_holidays"]:
+        if isinstance(holiday, dict):
+            lines.append(f"{holiday['date']};festivo;{holiday['name']}")
+    return ("\n".join(lines) + "\n").encode()
@@ -1,26 +1,32 @@
 import streamlit as st
-import calendar
+import cProfile
+import io
 import json
+import logging
+import marshal
+import pstats
+from collections import Counter
 from datetime import datetime, timedelta, date
 import os
-import pandas as pd
-import fitz  # PyMuPDF
-from pathlib import Path
-import locale
-from babel.dates import format_date
-import subprocess
-import sys
-import holidays
-import hashlib
 import time
-import requests
-import base64
+from streamlit_calendar import calendar as my_calendar
 
-try:
-    from streamlit_calendar import calendar as my_calendar
-except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "streamlit-calendar"])
-    from streamlit_calendar import calendar as my_calendar
+from vacaciones.balances import NATURAL_DAYS_PER_YEAR, BalancePolicy
+from vacaciones.business_days import BusinessCalendar
+from vacaciones.day_set import DaySet
+from vacaciones.derived import DerivedState
+from vacaciones.document import VacationDocument
+from vacaciones.holiday_calendar import HolidayCalendar
+from vacaciones.ics_feed import FeedCache, feed_url
+from vacaciones.importing import FORMATS, ImportFormatError, import_file, merge_import
+from vacaciones.metrics import PeriodicWriter, finish_rerun, instrument_storage, start_rerun, timed
+from vacaciones.report import (
+    load_template, merge_reports, month_range, render_months, render_report, report_file_name, report_pool, zip_reports
+)
+from vacaciones.storage import StorageError, content_version, get_storage
+from vacaciones.team import TeamAvailability
+from vacaciones.users import CredentialIndex, UserRegistry, hash_password, validate_username
+from vacaciones.write_behind import WriteBehindBuffer
 
 # Configurar página
 st.set_page_config(
@@ -30,131 +36,187 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Archivo para gestionar usuarios
-USERS_FILE = 'users.json'
 TEMPLATE_FILE = 'horas_registro.pdf'
 
-def hash_password(password):
-    """Hash de la contraseña usando SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def get_config():
+    """Configuración de st.secrets (vacía si no hay fichero de secretos)"""
+    if not st.secrets.load_if_toml_exists():
+        return {}
+    return dict(st.secrets)
+
+def get_setting(key, default=None):
+    """Ajuste de st.secrets o, si no está, del entorno"""
+    return get_config().get(key, os.environ.get(key, default))
+
+def is_enabled(key):
+    return str(get_setting(key, "")).lower() in ("1", "true", "yes", "si", "sí")
+
+@st.cache_resource
+def get_backend():
+    """Backend de almacenamiento configurado en secrets/entorno, con medición de tiempos"""
+    return instrument_storage(get_storage(get_config()))
+
+@st.cache_resource
+def get_write_buffer():
+    """Buffer de escritura diferida compartido por todas las sesiones"""
+    delay = get_setting("WRITE_BEHIND_DELAY", 3)
+    return WriteBehindBuffer(get_backend(), delay=float(delay))
+
+@st.cache_resource
+def get_registry():
+    """Registro de usuarios sobre el backend configurado"""
+    return UserRegistry(get_backend())
+
+@st.cache_resource
+def get_credentials():
+    """Índice de credenciales compartido por todas las sesiones"""
+    return CredentialIndex(get_registry())
+
+@st.cache_resource
+def get_report_pool():
+    """Pool de procesos compartido para la exportación de informes por lotes"""
+    workers = get_setting("REPORT_WORKERS")
+    return report_pool(int(workers) if workers else None)
+
+@st.cache_resource
+def get_feed_cache():
+    """Feeds iCalendar ya generados, compartidos por todas las sesiones"""
+    return FeedCache()
+
+@st.cache_resource
+def get_team_availability():
+    """Vacaciones de todos los usuarios para la vista del equipo, compartidas por todas las sesiones"""
+    return TeamAvailability(
+        get_backend(),
+        workers=int(get_setting("TEAM_LOAD_WORKERS", 16)),
+        max_age=float(get_setting("TEAM_REFRESH", 900))
+    )
+
+def is_team_lead(username):
+    """Usuarios de TEAM_LEADS (separados por comas, o * para todos) que ven la vista del equipo"""
+    leads = str(get_setting("TEAM_LEADS", ""))
+    return leads.strip() == "*" or username in {lead.strip() for lead in leads.split(",")}
+
+@st.cache_resource
+def get_metrics_writer():
+    """Escritor del fichero de métricas de Prometheus (None si no hay METRICS_FILE)"""
+    path = get_setting("METRICS_FILE")
+    if not path:
+        return None
+    return PeriodicWriter(path, float(get_setting("METRICS_INTERVAL", 15)))
+
+@st.cache_resource
+def configure_timing_log():
+    """Enviar las líneas JSON de tiempos a stderr si LOG_TIMINGS es INFO o DEBUG"""
+    level = str(get_setting("LOG_TIMINGS", "")).upper()
+    if level in ("INFO", "DEBUG"):
+        metrics_logger = logging.getLogger("vacaciones.metrics")
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(level)
+        metrics_logger.propagate = False
+    return level
 
-def load_users():
-    """Cargar usuarios desde GitHub"""
+def load_user(username):
+    """Cargar la ficha de un usuario"""
     try:
-        token = st.secrets["GITHUB_TOKEN"]
-        repo = st.secrets["GITHUB_REPO"]
-        branch = st.secrets.get("GITHUB_BRANCH", "main")
-        
-        api_url = f"https://api.github.com/repos/{repo}/contents/users.json?ref={branch}"
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        response = requests.get(api_url, headers=headers)
-        if response.status_code == 200:
-            content = response.json()
-            file_content = base64.b64decode(content['content']).decode()
-            return json.loads(file_content)
-        else:
-            return {}
+        return get_registry().get(username)
+    except StorageError:
+        # Almacenamiento no disponible: no es lo mismo que un usuario que no existe
+        raise
     except:
-        return {}
+        return None
 
-def save_users(users_dict):
-    """Guardar usuarios en GitHub"""
-    token = st.secrets["GITHUB_TOKEN"]
-    repo = st.secrets["GITHUB_REPO"]
-    branch = st.secrets.get("GITHUB_BRANCH", "main")
-    
-    api_url = f"https://api.github.com/repos/{repo}/contents/users.json"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    # Obtener SHA del archivo actual (si existe)
-    response = requests.get(api_url, headers=headers)
-    sha = None
-    if response.status_code == 200:
-        sha = response.json()["sha"]
-    
-    # Codificar contenido
-    encoded_content = base64.b64encode(json.dumps(users_dict, indent=4).encode()).decode()
-    
-    payload = {
-        "message": "🔄 Actualización de usuarios",
-        "content": encoded_content,
-        "branch": branch
-    }
-    
-    if sha:
-        payload["sha"] = sha
-    
-    result = requests.put(api_url, headers=headers, json=payload)
-    return result.status_code in [200, 201]
-
-def update_vacation_data_on_github(user_id, data_dict):
-    """Actualizar vacation_data_USER.json en GitHub"""
-    token = st.secrets["GITHUB_TOKEN"]
-    repo = st.secrets["GITHUB_REPO"]
-    branch = st.secrets.get("GITHUB_BRANCH", "main")
-    file_name = f"vacation_data_{user_id}.json"
-    
-    api_url = f"https://api.github.com/repos/{repo}/contents/{file_name}"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    # Obtener SHA
-    response = requests.get(api_url, headers=headers)
-    sha = None
-    if response.status_code == 200:
-        sha = response.json()["sha"]
-    
-    encoded_content = base64.b64encode(json.dumps(data_dict, indent=4).encode()).decode()
-    
-    payload = {
-        "message": f"🔄 Actualización de vacaciones de {user_id}",
-        "content": encoded_content,
-        "branch": branch
-    }
-    
-    if sha:
-        payload["sha"] = sha
-    
-    result = requests.put(api_url, headers=headers, json=payload)
-    
-    if result.status_code in [200, 201]:
+def update_vacation_data_on_github(user_id, document):
+    """Actualizar vacation_data_USER.json en el almacenamiento"""
+    try:
+        get_backend().save(
+            f"vacation_data_{user_id}.json",
+            document.encode(),
+            f"🔄 Actualización de vacaciones de {user_id}"
+        )
+        get_team_availability().update(user_id, document)
         st.toast("✅ Datos guardados", icon="💾")
-    else:
-        st.error(f"❌ Error al guardar: {result.json()}")
+    except StorageError as e:
+        st.error(f"❌ Error al guardar: {e}")
 
 def load_vacation_data(user_id):
-    """Cargar datos de vacaciones desde GitHub"""
-    token = st.secrets["GITHUB_TOKEN"]
-    repo = st.secrets["GITHUB_REPO"]
-    branch = st.secrets.get("GITHUB_BRANCH", "main")
+    """Cargar datos de vacaciones (incluidos los cambios aún no guardados)"""
     file_name = f"vacation_data_{user_id}.json"
-    
-    api_url = f"https://api.github.com/repos/{repo}/contents/{file_name}?ref={branch}"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    response = requests.get(api_url, headers=headers)
-    if response.status_code == 200:
-        content = response.json()
-        file_content = base64.b64decode(content['content']).decode()
-        return json.loads(file_content)
-    
-    return None
+    pending = get_write_buffer().get(file_name)
+    if pending is not None:
+        return pending
+    return get_backend().load(file_name)
 
-def save_vacation_data(user_id, data):
-    """Guardar datos de vacaciones"""
-    update_vacation_data_on_github(user_id, data)
+def load_vacation_document(user_id):
+    """Documento de vacaciones decodificado, reutilizado mientras su contenido no cambie"""
+    vacation_data = load_vacation_data(user_id)
+    if not vacation_data:
+        return None
+    version = content_version(vacation_data)
+    document = st.session_state.get('vacation_document')
+    if document is None or document.version != version:
+        with timed("decode_document"):
+            document = VacationDocument.from_dict(vacation_data, version)
+        st.session_state['vacation_document'] = document
+    return document
+
+def get_balance_policy():
+    """Traspaso de días sobrantes: CARRY_OVER_MAX días como mucho, hasta CARRY_OVER_UNTIL (MM-DD)"""
+    month, day = str(get_setting("CARRY_OVER_UNTIL", "03-31")).split("-")
+    return BalancePolicy(int(get_setting("CARRY_OVER_MAX", 0)), (int(month), int(day)))
+
+def get_derived_state(document):
+    """Datos derivados del documento, reutilizados mientras su contenido no cambie"""
+    state = st.session_state.get('derived_state')
+    if state is None or not state.is_current(document):
+        with timed("derived_state"):
+            state = DerivedState(document, get_balance_policy())
+        st.session_state['derived_state'] = state
+    return state
+
+def save_vacation_data(user_id, document):
+    """Guardar datos de vacaciones agrupando los cambios rápidos en una sola escritura"""
+    try:
+        get_write_buffer().stage(
+            f"vacation_data_{user_id}.json",
+            document.encode(),
+            f"🔄 Actualización de vacaciones de {user_id}"
+        )
+        # La vista del equipo solo recalcula la fila de este usuario
+        get_team_availability().update(user_id, document)
+    except StorageError as e:
+        st.error(f"❌ Error al guardar: {e}")
+
+def flush_vacation_data(user_id):
+    """Guardar ya los cambios pendientes del usuario"""
+    try:
+        get_write_buffer().flush(f"vacation_data_{user_id}.json")
+        return True
+    except StorageError as e:
+        st.error(f"❌ Error al guardar: {e}")
+        return False
+
+def read_import(uploaded_file, custom_days=()):
+    """Leer y validar un fichero de importación una sola vez por fichero subido"""
+    cached = st.session_state.get('import_result')
+    if cached is not None and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    uploaded_file.seek(0)
+    result = import_file(uploaded_file, uploaded_file.name, custom_days)
+    st.session_state['import_result'] = (uploaded_file.file_id, result)
+    return result
+
+def show_rejected_rows(result):
+    """Mostrar las filas descartadas de una importación"""
+    if result.rejected:
+        with st.expander(f"⚠️ {len(result.rejected)} filas descartadas"):
+            st.dataframe(
+                [{"Origen": source, "Valor": str(value), "Motivo": reason} for source, value, reason in result.rejected],
+                use_container_width=True,
+                hide_index=True
+            )
 
 def check_authentication():
     """Verificar si el usuario está autenticado"""
@@ -237,18 +299,19 @@ def register_form():
             st.info("Si ya tienes datos de vacaciones guardados, puedes importarlos aquí")
             
             uploaded_file = st.file_uploader(
-                "Sube tu archivo vacation_data.json",
-                type=['json'],
+                "Sube tu archivo vacation_data.json, CSV o iCalendar",
+                type=list(FORMATS),
                 help="Importa tus días de vacaciones y festivos personalizados"
             )
             
             import_data = None
             if uploaded_file is not None:
                 try:
-                    import_data = json.load(uploaded_file)
-                    st.success(f"✅ Archivo cargado: {len(import_data.get('used_days', []))} días de vacaciones, {len(import_data.get('custom_holidays', []))} festivos personalizados")
-                except:
-                    st.error("❌ Error al leer el archivo JSON")
+                    import_data = read_import(uploaded_file)
+                    st.success(f"✅ Archivo cargado: {len(import_data.used_days)} días de vacaciones, {len(import_data.custom_holidays)} festivos personalizados")
+                    show_rejected_rows(import_data)
+                except ImportFormatError as e:
+                    st.error(f"❌ Error al leer el archivo: {e}")
             
             st.markdown("<br>", unsafe_allow_html=True)
             
@@ -285,16 +348,15 @@ def register_form():
                     st.error("❌ La contraseña debe tener al menos 4 caracteres")
                     return
                 
-                # Cargar usuarios existentes
-                users = load_users()
-                
-                if username in users:
-                    st.error("❌ El usuario ya existe")
+                try:
+                    validate_username(username)
+                except ValueError:
+                    st.error("❌ El usuario no puede empezar por '.' ni contener '/', '\\' o ':'")
                     return
                 
                 # Crear nuevo usuario
                 hashed_password = hash_password(password)
-                users[username] = {
+                new_user = {
                     "password": hashed_password,
                     "full_name": full_name,
                     "nif": nif.upper(),
@@ -303,32 +365,39 @@ def register_form():
                     "created_at": datetime.now().isoformat()
                 }
                 
-                # Guardar usuarios
-                if save_users(users):
-                    # Crear archivo de vacaciones inicial
-                    vacation_data = {
-                        "total_days": total_days,
-                        "used_days": import_data.get('used_days', []) if import_data else [],
-                        "custom_holidays": import_data.get('custom_holidays', []) if import_data else [],
-                        "full_name": full_name,
-                        "nif": nif.upper(),
-                        "workplace": workplace,
-                        "company": company
-                    }
-                    
-                    update_vacation_data_on_github(username, vacation_data)
-                    
-                    success_msg = "✅ Cuenta creada exitosamente."
-                    if import_data:
-                        success_msg += f" Se importaron {len(vacation_data['used_days'])} días de vacaciones y {len(vacation_data['custom_holidays'])} festivos personalizados."
-                    success_msg += " Ya puedes iniciar sesión."
-                    
-                    st.success(success_msg)
-                    time.sleep(2)
-                    st.session_state.show_register = False
-                    st.rerun()
-                else:
+                try:
+                    created = get_registry().create(username, new_user)
+                except StorageError:
                     st.error("❌ Error al crear la cuenta. Inténtalo de nuevo.")
+                    return
+                
+                if not created:
+                    st.error("❌ El usuario ya existe")
+                    return
+                get_credentials().add(username, hashed_password)
+                
+                # Crear archivo de vacaciones inicial
+                document = VacationDocument.new(
+                    total_days,
+                    full_name=full_name,
+                    nif=nif.upper(),
+                    workplace=workplace,
+                    company=company
+                )
+                if import_data:
+                    document = merge_import(document, import_data, replace=True)
+                
+                update_vacation_data_on_github(username, document)
+                
+                success_msg = "✅ Cuenta creada exitosamente."
+                if import_data:
+                    success_msg += f" Se importaron {len(document.used_days)} días de vacaciones y {len(document.custom_holidays)} festivos personalizados."
+                success_msg += " Ya puedes iniciar sesión."
+                
+                st.success(success_msg)
+                time.sleep(2)
+                st.session_state.show_register = False
+                st.rerun()
 
 def login_form():
     """Formulario de login"""
@@ -394,13 +463,20 @@ def login_form():
             
             if submit_button:
                 if username and password:
-                    users = load_users()
                     hashed_password = hash_password(password)
+                    try:
+                        valid = get_credentials().check(username, hashed_password)
+                        user = load_user(username) if valid else None
+                    except StorageError as e:
+                        st.error(f"❌ No se pudo acceder a los datos de usuario: {e}")
+                        return
+                    except:
+                        user = None
                     
-                    if username in users and users[username]["password"] == hashed_password:
+                    if user:
                         st.session_state['authenticated'] = True
                         st.session_state['username'] = username
-                        st.session_state['user_data'] = users[username]
+                        st.session_state['user_data'] = user
                         st.session_state['login_time'] = time.time()
                         st.success("✅ Credenciales correctas")
                         time.sleep(1)
@@ -418,7 +494,9 @@ def login_form():
 
 def logout():
     """Cerrar sesión"""
-    for key in ['authenticated', 'username', 'user_data', 'login_time']:
+    if 'username' in st.session_state:
+        flush_vacation_data(st.session_state['username'])
+    for key in ['authenticated', 'username', 'user_data', 'login_time', 'vacation_document', 'derived_state', 'import_result']:
         if key in st.session_state:
             del st.session_state[key]
     st.rerun()
@@ -433,142 +511,16 @@ def check_session_timeout():
             return False
     return True
 
-def get_madrid_holidays(year, custom_days=[]):
-    """Obtener festivos de Madrid"""
-    madrid_holidays = holidays.Spain(years=year, subdiv='MD')
-    for custom_day_dict in custom_days:
-        try:
-            if isinstance(custom_day_dict, dict):
-                custom_date = datetime.strptime(custom_day_dict['date'], '%Y-%m-%d').date()
-                custom_name = custom_day_dict.get('name', 'Festivo personalizado')
-            else:
-                # Compatibilidad con formato antiguo (solo string)
-                custom_date = datetime.strptime(custom_day_dict, '%Y-%m-%d').date()
-                custom_name = "Festivo personalizado"
-            
-            if custom_date.year == year:
-                madrid_holidays.append({custom_date: custom_name})
-        except (ValueError, KeyError):
-            pass
-    return madrid_holidays
-
-def calculate_remaining_days(total_days, used_days):
-    """Calcular días restantes"""
-    return total_days - len(used_days)
+def get_madrid_holidays(year, custom_days=()):
+    """Obtener festivos de Madrid (oficiales cacheados más los personalizados)"""
+    with timed("holidays"):
+        return HolidayCalendar(year, custom_days)
 
-def create_calendar_events(vacation_data, selected_year):
-    """Crear eventos para calendario"""
-    eventos = []
-    
-    festivos_madrid = get_madrid_holidays(selected_year, vacation_data.get('custom_holidays', []))
-    
-    for fecha, nombre in festivos_madrid.items():
-        eventos.append({
-            "title": f"🎉 {nombre}",
-            "start": fecha.isoformat(),
-            "allDay": True,
-            "color": "#FF6B6B",
-            "textColor": "white"
-        })
-    
-    for fecha_str in vacation_data.get('used_days', []):
-        try:
-            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            if fecha.year == selected_year:
-                eventos.append({
-                    "title": "🏖️ Vacaciones",
-                    "start": fecha.isoformat(),
-                    "allDay": True,
-                    "color": "#4ECDC4",
-                    "textColor": "white"
-                })
-        except ValueError:
-            continue
-    
-    return eventos
-
-def fill_pdf_template(selected_month, used_days, vacation_data):
-    """Rellenar PDF con datos del usuario"""
-    month_name = format_date(selected_month, "LLLL", locale="es").upper()
-    OUTPUT_FILE = f'{month_name}_registro.pdf'
-
-    with fitz.open(TEMPLATE_FILE) as doc:
-        first_day = datetime(selected_month.year, selected_month.month, 1)
-        last_day = datetime(selected_month.year, selected_month.month, calendar.monthrange(selected_month.year, selected_month.month)[1])
-        madrid_holidays = get_madrid_holidays(selected_month.year, vacation_data['custom_holidays'])
-        workdays = [
-            day for day in pd.date_range(start=first_day, end=last_day)
-            if day.weekday() < 5
-        ]
-        
-        for page_index in range(len(doc)):
-            target_page = doc[page_index]
-            fields = list(target_page.widgets())
-            
-            if page_index == 0:
-                for f in fields:
-                    if f.field_name:
-                        fname = f.field_name.upper()
-                        if "MES" in fname:
-                            f.field_value = month_name
-                            f.update()
-                        if "AÑO" in fname or "ANIO" in fname:
-                            f.field_value = str(selected_month.year)
-                            f.update()
-                        if "CENTRO" in fname:
-                            f.field_value = vacation_data.get('workplace', '')
-                            f.update()
-                        if "NIF" in fname:
-                            f.field_value = vacation_data.get('nif', '')
-                            f.update()
-                        if "NOMBRE" in fname:
-                            f.field_value = vacation_data.get('full_name', '')
-                            f.update()
-                        if "EMPRESA" in fname:
-                            f.field_value = vacation_data.get('company', '')
-                            f.update()
-            
-            cell_index = 5 if page_index == 0 else 0
-            
-            while cell_index < len(fields) and workdays:
-                day = workdays.pop(0)
-                day_str = day.day
-                is_vacation = day.strftime('%Y-%m-%d') in used_days
-                is_festivo = day in madrid_holidays
-                
-                fields[cell_index].field_value = str(day_str)
-                fields[cell_index].update()
-                
-                if is_festivo:
-                    if cell_index + 8 < len(fields):
-                        fields[cell_index + 8].field_value = "FESTIVO"
-                        fields[cell_index + 8].update()
-                    cell_index += 9
-                elif is_vacation:
-                    if cell_index + 8 < len(fields):
-                        fields[cell_index + 8].field_value = "VACACIONES"
-                        fields[cell_index + 8].update()
-                    cell_index += 9
-                else:
-                    if cell_index + 4 < len(fields):
-                        fields[cell_index + 1].field_value = "9:00"
-                        fields[cell_index + 2].field_value = "13:00"
-                        fields[cell_index + 3].field_value = "14:00"
-                        fields[cell_index + 4].field_value = "17:30"
-                        fields[cell_index + 7].field_value = "7,5"
-                        
-                        fields[cell_index + 1].update()
-                        fields[cell_index + 2].update()
-                        fields[cell_index + 3].update()
-                        fields[cell_index + 4].update()
-                        fields[cell_index + 7].update()
-                    cell_index += 9
-                
-                if not workdays:
-                    break
-        
-        doc.save(OUTPUT_FILE)
-    return OUTPUT_FILE
+def fill_pdf_template(selected_month, document):
+    """Rellenar PDF con datos del usuario y devolverlo como bytes"""
+    madrid_holidays = get_madrid_holidays(selected_month.year, document.holiday_map())
+    with timed("pdf"):
+        return render_report(selected_month, document, madrid_holidays, load_template(TEMPLATE_FILE))
 
 def main_app():
     """Aplicación principal"""
@@ -584,62 +536,61 @@ def main_app():
     
     st.markdown("---")
     
-    vacation_data = load_vacation_data(username)
+    # Decodificado una vez por versión del documento guardado
+    try:
+        document = load_vacation_document(username)
+    except StorageError as e:
+        st.error(f"❌ No se pudieron cargar los datos de vacaciones: {e}")
+        return
     
-    if not vacation_data:
+    if not document:
         st.error("Error al cargar datos de vacaciones")
         print()
         return
     
+    # Días usados, saldo, eventos y resumen: se recalculan solo si cambia el documento
+    derived = get_derived_state(document)
+    used_days = derived.used_days
+    
     with st.sidebar:
         st.header("⚙️ Configuración")
         
         # Botón para importar datos
         with st.expander("📥 Importar datos de vacaciones"):
-            st.write("Importa días de vacaciones y festivos desde un archivo JSON")
+            st.write("Importa días de vacaciones y festivos desde un archivo JSON, CSV o iCalendar")
             
-            import_file = st.file_uploader(
-                "Sube vacation_data.json",
-                type=['json'],
+            uploaded_import = st.file_uploader(
+                "Sube vacation_data.json, CSV o .ics",
+                type=list(FORMATS),
                 key="import_existing"
             )
             
-            if import_file is not None:
+            if uploaded_import is not None:
                 try:
-                    imported_data = json.load(import_file)
+                    imported_data = read_import(uploaded_import, document.holiday_map())
                     
                     st.write("**Datos a importar:**")
-                    st.write(f"- Días de vacaciones: {len(imported_data.get('used_days', []))}")
-                    st.write(f"- Festivos personalizados: {len(imported_data.get('custom_holidays', []))}")
+                    st.write(f"- Días de vacaciones: {len(imported_data.used_days)}")
+                    st.write(f"- Festivos personalizados: {len(imported_data.custom_holidays)}")
+                    show_rejected_rows(imported_data)
                     
                     col_imp1, col_imp2 = st.columns(2)
                     
                     with col_imp1:
                         if st.button("✅ Importar y reemplazar", type="primary"):
-                            vacation_data['used_days'] = imported_data.get('used_days', [])
-                            vacation_data['custom_holidays'] = imported_data.get('custom_holidays', [])
-                            save_vacation_data(username, vacation_data)
+                            save_vacation_data(username, merge_import(document, imported_data, replace=True))
                             st.success("✅ Datos importados correctamente")
                             st.rerun()
                     
                     with col_imp2:
                         if st.button("➕ Importar y combinar"):
-                            # Combinar sin duplicados
-                            existing_used = set(vacation_data['used_days'])
-                            existing_holidays = set(vacation_data.get('custom_holidays', []))
-                            
-                            new_used = set(imported_data.get('used_days', []))
-                            new_holidays = set(imported_data.get('custom_holidays', []))
-                            
-                            vacation_data['used_days'] = list(existing_used | new_used)
-                            vacation_data['custom_holidays'] = list(existing_holidays | new_holidays)
-                            
-                            save_vacation_data(username, vacation_data)
+                            # Combinar sin duplicar fechas
+                            save_vacation_data(username, merge_import(document, imported_data))
                             st.success("✅ Datos combinados correctamente")
                             st.rerun()
                             
-                except Exception as e:
-                    st.error(f"❌ Error al leer el archivo: {str(e)}")
+                except ImportFormatError as e:
+                    st.error(f"❌ Error al leer el archivo: {e}")
         
         st.markdown("---")
 
@@ -649,47 +600,49 @@ def main_app():
             
             new_full_name = st.text_input(
                 "Nombre completo:",
-                value=vacation_data.get('full_name', ''),
+                value=document.full_name,
                 key="edit_name"
             )
             
             new_nif = st.text_input(
                 "NIF/DNI:",
-                value=vacation_data.get('nif', ''),
+                value=document.nif,
                 max_chars=9,
                 key="edit_nif"
             )
             
             new_workplace = st.text_input(
                 "Centro de trabajo:",
-                value=vacation_data.get('workplace', ''),
+                value=document.workplace,
                 key="edit_workplace"
             )
             
             new_company = st.text_input(
                 "Empresa:",
-                value=vacation_data.get('company', ''),
+                value=document.company,
                 key="edit_company"
             )
             
             if st.button("💾 Guardar cambios", type="primary", key="save_personal_data"):
-                # Actualizar vacation_data
-                vacation_data['full_name'] = new_full_name
-                vacation_data['nif'] = new_nif.upper()
-                vacation_data['workplace'] = new_workplace
-                vacation_data['company'] = new_company
+                # Actualizar el documento
+                document.full_name = new_full_name
+                document.nif = new_nif.upper()
+                document.workplace = new_workplace
+                document.company = new_company
                 
                 # Guardar en GitHub
-                save_vacation_data(username, vacation_data)
+                save_vacation_data(username, document)
                 
-                # Actualizar también en users.json
-                users = load_users()
-                if username in users:
-                    users[username]['full_name'] = new_full_name
-                    users[username]['nif'] = new_nif.upper()
-                    users[username]['workplace'] = new_workplace
-                    users[username]['company'] = new_company
-                    save_users(users)
+                # Actualizar también la ficha del usuario
+                try:
+                    get_registry().update(username, {
+                        'full_name': new_full_name,
+                        'nif': new_nif.upper(),
+                        'workplace': new_workplace,
+                        'company': new_company
+                    })
+                except StorageError as e:
+                    st.error(f"❌ Error al guardar: {e}")
                 
                 st.success("✅ Datos actualizados correctamente")
                 time.sleep(1)
@@ -699,27 +652,63 @@ def main_app():
             'Días laborables libres al año:',
             min_value=0,
             max_value=50,
-            value=vacation_data['total_days'],
+            value=document.total_days,
             help="Número total de días de vacaciones disponibles"
         )
         
-        if total_days != vacation_data['total_days']:
-            vacation_data['total_days'] = total_days
-            save_vacation_data(username, vacation_data)
+        if total_days != document.total_days:
+            document.total_days = total_days
+            save_vacation_data(username, document)
+            derived = get_derived_state(document)
             st.success("Configuración actualizada")
         
-        st.info("**Por contrato:** 30 días naturales por año trabajado")
+        start_date = st.date_input(
+            'Fecha de alta (opcional):',
+            value=document.start_date,
+            min_value=date(2000, 1, 1),
+            help="El año de alta se cuenta en proporción a los días trabajados"
+        )
+        if start_date != document.start_date:
+            document.start_date = start_date
+            save_vacation_data(username, document)
+            derived = get_derived_state(document)
+            st.success("Configuración actualizada")
+        
+        st.info(f"**Por contrato:** {NATURAL_DAYS_PER_YEAR} días naturales por año trabajado")
         
-        remaining_days = calculate_remaining_days(vacation_data['total_days'], vacation_data['used_days'])
+        write_buffer = get_write_buffer()
+        vacation_file = f"vacation_data_{username}.json"
+        if vacation_file in write_buffer.errors:
+            st.error(f"❌ Error al guardar: {write_buffer.errors[vacation_file]}")
+        if write_buffer.is_pending(vacation_file):
+            st.caption("⏳ Hay cambios pendientes de guardar")
+            if st.button("💾 Guardar ahora", key="flush_pending"):
+                if flush_vacation_data(username):
+                    st.toast("✅ Datos guardados", icon="💾")
+                    st.rerun()
+        
+        # Saldo del año elegido en el selector de la página (widget con clave, ya disponible aquí)
+        balance_year = st.session_state.get('selected_year', date.today().year)
+        balance = derived.balance(balance_year)
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total", vacation_data['total_days'])
+            st.metric("Total", balance.allowance + balance.carried_in, help=f"Días disponibles en {balance_year}")
         with col2:
-            st.metric("Restantes", remaining_days)
+            st.metric("Restantes", balance.remaining, help=f"Días que quedan en {balance_year}")
+        if balance.expired:
+            st.caption(
+                f"{balance.expired} días traspasados de {balance_year - 1} "
+                f"caducaron el {balance.expires.strftime('%d/%m/%Y')}"
+            )
+        elif balance.carried_in:
+            st.caption(
+                f"Incluye {balance.carried_in} días traspasados de {balance_year - 1}, "
+                f"a usar hasta el {balance.expires.strftime('%d/%m/%Y')}"
+            )
         
         if st.button('🔄 Resetear Vacaciones', type="secondary"):
-            vacation_data['used_days'] = []
-            save_vacation_data(username, vacation_data)
+            derived.replace_used_days(DaySet())
+            save_vacation_data(username, document)
             st.success('Días de vacaciones reseteados')
             st.rerun()
         
@@ -728,10 +717,11 @@ def main_app():
         with st.expander("📤 Exportar datos"):
             st.write("Descarga tus datos de vacaciones como respaldo")
             
+            stored = document.to_dict()
             export_data = {
-                "total_days": vacation_data['total_days'],
-                "used_days": vacation_data['used_days'],
-                "custom_holidays": vacation_data.get('custom_holidays', [])
+                "total_days": stored['total_days'],
+                "used_days": stored['used_days'],
+                "custom_holidays": stored['custom_holidays']
             }
             
             export_json = json.dumps(export_data, indent=4)
@@ -742,6 +732,21 @@ def main_app():
                 file_name=f"vacation_data_{username}.json",
                 mime="application/json"
             )
+            
+            # Solo se regenera si el documento ha cambiado desde la última vez
+            feed = get_feed_cache().get(username, document)
+            st.download_button(
+                label="⬇️ Descargar calendario .ics",
+                data=feed.body,
+                file_name=f"vacaciones_{username}.ics",
+                mime="text/calendar"
+            )
+            
+            feed_base = get_setting("ICS_FEED_URL")
+            feed_secret = get_setting("ICS_FEED_SECRET")
+            if feed_base and feed_secret:
+                st.caption("Suscríbete desde tu aplicación de calendario:")
+                st.code(feed_url(feed_base, feed_secret, username), language=None)
 
     current_year = date.today().year
     
@@ -751,11 +756,15 @@ def main_app():
     with year_col2:
         selected_year = st.selectbox(
             "Año:",
-            options=[current_year - 1, current_year, current_year + 1],
-            index=1
+            options=list(range(current_year - 5, current_year + 3)),
+            index=5,
+            key="selected_year"
         )
     
-    eventos = create_calendar_events(vacation_data, selected_year)
+    year_view = derived.year(selected_year)
+    
+    with timed("calendar_events"):
+        eventos = derived.events_between(date(selected_year, 1, 1), date(selected_year + 1, 1, 1))
     
     # Usar la fecha de hoy si el año seleccionado es el actual, si no enero
     today = date.today()
@@ -811,9 +820,10 @@ def main_app():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ Añadir como Vacaciones", type="primary"):
-                    if st.session_state.selected_date not in vacation_data["used_days"]:
-                        vacation_data["used_days"].append(st.session_state.selected_date)
-                        save_vacation_data(username, vacation_data)
+                    if st.session_state.selected_date not in used_days:
+                        derived.add_day(st.session_state.selected_date)
+                        save_vacation_data(username, document)
+                        derived.commit()
                         st.success("Día añadido correctamente")
                         st.rerun()
                     else:
@@ -821,9 +831,10 @@ def main_app():
             
             with col2:
                 if st.button("❌ Eliminar Vacaciones", type="secondary"):
-                    if st.session_state.selected_date in vacation_data["used_days"]:
-                        vacation_data["used_days"].remove(st.session_state.selected_date)
-                        save_vacation_data(username, vacation_data)
+                    if st.session_state.selected_date in used_days:
+                        derived.remove_day(st.session_state.selected_date)
+                        save_vacation_data(username, document)
+                        derived.commit()
                         st.success("Día eliminado correctamente")
                         st.rerun()
                     else:
@@ -843,35 +854,39 @@ def main_app():
         
         if len(date_range) == 2:
             start_sel, end_sel = date_range
-            days_in_range = []
-            current_date = start_sel
-            while current_date <= end_sel:
-                if current_date.weekday() < 5:
-                    days_in_range.append(current_date.strftime('%Y-%m-%d'))
-                current_date += timedelta(days=1)
+            festivos_rango = get_madrid_holidays(
+                range(start_sel.year, end_sel.year + 1),
+                document.holiday_map()
+            )
+            days_in_range = DaySet.from_datetime64(BusinessCalendar(festivos_rango).days(start_sel, end_sel))
+            new_days = days_in_range - used_days
             
-            st.info(f"Días laborables en el rango: {len(days_in_range)}")
+            remaining_after = derived.balance(selected_year).remaining - len(new_days)
+            st.info(
+                f"Días laborables en el rango (sin festivos): {len(days_in_range)} · "
+                f"nuevos: {len(new_days)} · quedarían {remaining_after} días"
+            )
+            # El rango por defecto es el año entero: avisar solo cuando el usuario elige uno
+            if (start_sel, end_sel) != (start_date, end_date):
+                warn_team_overlaps(username, new_days)
             
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ Añadir Rango como Vacaciones", type="primary"):
-                    added_days = 0
-                    for day in days_in_range:
-                        if day not in vacation_data["used_days"]:
-                            vacation_data["used_days"].append(day)
-                            added_days += 1
-                    save_vacation_data(username, vacation_data)
+                    added_days = len(new_days)
+                    derived.replace_used_days(used_days | new_days)
+                    save_vacation_data(username, document)
+                    derived.commit()
                     st.success(f"Se añadieron {added_days} días de vacaciones")
                     st.rerun()
             
             with col2:
                 if st.button("❌ Eliminar Rango de Vacaciones", type="secondary"):
-                    removed_days = 0
-                    for day in days_in_range:
-                        if day in vacation_data["used_days"]:
-                            vacation_data["used_days"].remove(day)
-                            removed_days += 1
-                    save_vacation_data(username, vacation_data)
+                    remaining = used_days - DaySet.from_range(start_sel, end_sel)
+                    removed_days = len(used_days) - len(remaining)
+                    derived.replace_used_days(remaining)
+                    save_vacation_data(username, document)
+                    derived.commit()
                     st.success(f"Se eliminaron {removed_days} días de vacaciones")
                     st.rerun()
     
@@ -888,36 +903,9 @@ def main_app():
         
         if st.button("➕ Añadir Festivo Personalizado"):
             if custom_name:
-                custom_date_str = custom_date.strftime('%Y-%m-%d')
-                # Verificar si ya existe
-                already_exists = False
-                for holiday in vacation_data.get('custom_holidays', []):
-                    if isinstance(holiday, dict):
-                        if holiday['date'] == custom_date_str:
-                            already_exists = True
-                            break
-                    elif holiday == custom_date_str:
-                        already_exists = True
-                        break
-                
-                if not already_exists:
-                    # Convertir formato antiguo si existe
-                    if 'custom_holidays' not in vacation_data:
-                        vacation_data['custom_holidays'] = []
-                    
-                    # Convertir strings antiguos a nuevo formato
-                    new_holidays = []
-                    for h in vacation_data['custom_holidays']:
-                        if isinstance(h, str):
-                            new_holidays.append({'date': h, 'name': 'Festivo personalizado'})
-                        else:
-                            new_holidays.append(h)
-                    
-                    # Añadir el nuevo festivo
-                    new_holidays.append({'date': custom_date_str, 'name': custom_name})
-                    vacation_data['custom_holidays'] = new_holidays
-                    
-                    save_vacation_data(username, vacation_data)
+                # Los festivos antiguos ya se normalizaron al decodificar el documento
+                if document.add_holiday(custom_date, custom_name):
+                    save_vacation_data(username, document)
                     st.success(f"Festivo '{custom_name}' añadido")
                     st.rerun()
                 else:
@@ -934,9 +922,12 @@ def main_app():
         first_of_month = today.replace(day=1)
         last_month = first_of_month - timedelta(days=1)
         
+        # El mes anterior, limitado al año seleccionado
+        default_month = min(max(last_month.date(), date(selected_year, 1, 1)), date(selected_year, 12, 31))
+        
         selected_month = st.date_input(
             'Selecciona el mes del informe:',
-            value=last_month,
+            value=default_month,
             min_value=date(selected_year, 1, 1),
             max_value=date(selected_year, 12, 31)
         )
@@ -944,31 +935,81 @@ def main_app():
     with col2:
         if st.button('Generar Informe PDF', type="primary"):
             try:
-                output_pdf = fill_pdf_template(selected_month, vacation_data['used_days'], vacation_data)
-                with open(output_pdf, 'rb') as f:
-                    st.download_button(
-                        label="⬇️ Descargar Informe",
-                        data=f,
-                        file_name=output_pdf,
-                        mime="application/pdf"
-                    )
+                output_pdf = fill_pdf_template(selected_month, document)
+                st.download_button(
+                    label="⬇️ Descargar Informe",
+                    data=output_pdf,
+                    file_name=report_file_name(selected_month),
+                    mime="application/pdf"
+                )
                 st.success("Informe generado correctamente")
             except Exception as e:
                 st.error(f"Error al generar el informe: {str(e)}")
     
+    with st.expander("🗂️ Exportación por lotes (varios meses)"):
+        batch_range = st.date_input(
+            "Meses a exportar:",
+            value=(date(selected_year, 1, 1), date(selected_year, 12, 31)),
+            key="batch_range"
+        )
+        batch_format = st.radio(
+            "Formato:",
+            ["PDF combinado", "ZIP con un PDF por mes"],
+            horizontal=True,
+            key="batch_format"
+        )
+        
+        if len(batch_range) == 2 and st.button("Generar informes", key="batch_generate"):
+            batch_start, batch_end = batch_range
+            months = month_range(batch_start, batch_end)
+            progress_bar = st.progress(0.0, text="Generando informes...")
+            
+            def report_progress(done, total, month):
+                progress_bar.progress(done / total, text=f"{month.strftime('%m/%Y')} listo ({done}/{total})")
+            
+            try:
+                festivos = get_madrid_holidays(
+                    range(batch_start.year, batch_end.year + 1),
+                    document.holiday_map()
+                )
+                reports = render_months(
+                    months, document, festivos,
+                    executor=get_report_pool(), progress=report_progress, template=TEMPLATE_FILE
+                )
+                period = f"{months[0].strftime('%Y_%m')}-{months[-1].strftime('%Y_%m')}"
+                if batch_format == "PDF combinado":
+                    batch_data, batch_name, batch_mime = merge_reports(reports), f"informes_{period}.pdf", "application/pdf"
+                else:
+                    batch_data, batch_name, batch_mime = zip_reports(reports), f"informes_{period}.zip", "application/zip"
+                st.download_button(
+                    label="⬇️ Descargar Informes",
+                    data=batch_data,
+                    file_name=batch_name,
+                    mime=batch_mime
+                )
+                st.success(f"{len(reports)} informes generados correctamente")
+            except Exception as e:
+                st.error(f"Error al generar los informes: {str(e)}")
+    
     st.markdown("---")
     st.header("Resumen")
     
+    balance = derived.balance(selected_year)
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Días del año", balance.allowance)
+    col2.metric("Traspasados", balance.carried_in)
+    col3.metric("Usados", balance.used)
+    col4.metric("Caducados", balance.expired)
+    col5.metric("Restantes", balance.remaining)
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
         st.subheader("Días de Vacaciones")
-        vacation_dates = [d for d in vacation_data['used_days'] if datetime.strptime(d, '%Y-%m-%d').year == selected_year]
-        vacation_dates.sort()
+        vacation_dates = year_view.vacation_days()
         
         if vacation_dates:
-            for date_str in vacation_dates:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+            for date_obj in vacation_dates:
                 st.write(f"• {date_obj.strftime('%d/%m/%Y')} - {date_obj.strftime('%A')}")
         else:
             st.write("No hay días de vacaciones registrados")
@@ -983,42 +1024,160 @@ def main_app():
     
     with col3:
         st.subheader("Festivos Personalizados")
-        custom_holidays_data = vacation_data.get('custom_holidays', [])
-        custom_holidays_display = []
-        
-        for holiday in custom_holidays_data:
-            if isinstance(holiday, dict):
-                try:
-                    date_obj = datetime.strptime(holiday['date'], '%Y-%m-%d')
-                    if date_obj.year == selected_year:
-                        custom_holidays_display.append({
-                            'date': date_obj,
-                            'name': holiday.get('name', 'Festivo personalizado')
-                        })
-                except ValueError:
-                    pass
-            else:
-                # Formato antiguo (solo string)
-                try:
-                    date_obj = datetime.strptime(holiday, '%Y-%m-%d')
-                    if date_obj.year == selected_year:
-                        custom_holidays_display.append({
-                            'date': date_obj,
-                            'name': 'Festivo personalizado'
-                        })
-                except ValueError:
-                    pass
-        
-        custom_holidays_display.sort(key=lambda x: x['date'])
+        custom_holidays_display = document.holidays_in(selected_year)
         
         if custom_holidays_display:
             for holiday in custom_holidays_display:
-                st.write(f"• {holiday['date'].strftime('%d/%m/%Y')} - {holiday['name']}")
+                st.write(f"• {holiday.date.strftime('%d/%m/%Y')} - {holiday.name}")
         else:
             st.write("No hay festivos personalizados")
+    
+    if is_team_lead(username):
+        show_team_view(username, selected_year)
 
-def main():
-    """Función principal"""
+def format_days(days, limit=5):
+    """Fechas ISO como dd/mm/aaaa, como mucho ``limit`` y el número del resto"""
+    shown = ", ".join(date.fromisoformat(day).strftime('%d/%m/%Y') for day in days[:limit])
+    return shown + (f" y {len(days) - limit} más" if len(days) > limit else "")
+
+def warn_team_overlaps(username, new_days):
+    """Avisar antes de guardar si los días nuevos coinciden con vacaciones de compañeros"""
+    if not new_days:
+        return
+    team = get_team_availability()
+    # La carga del equipo no se hace en esta ejecución: se avisa con lo que ya haya cargado
+    team.refresh_in_background(get_credentials().usernames())
+    if team.error:
+        st.caption(f"No se pudo comprobar si coinciden con vacaciones de compañeros: {team.error}")
+    if not team.loaded:
+        return
+    colleagues = team.colleagues(username)
+    days = new_days.to_iso()
+    
+    overlaps = team.index.overlaps(username, days, among=colleagues)
+    if overlaps and not is_team_lead(username):
+        # Quién coincide solo lo ven quienes tienen acceso a la vista del equipo
+        st.warning(f"⚠️ {len(overlaps)} de los días nuevos coinciden con vacaciones de compañeros")
+    elif overlaps:
+        per_colleague = Counter(colleague for users in overlaps.values() for colleague in users)
+        names = ", ".join(
+            f"{team.summary(colleague).get('full_name') or colleague} ({count} {'día' if count == 1 else 'días'})"
+            for colleague, count in per_colleague.most_common(5)
+        )
+        if len(per_colleague) > 5:
+            names += f" y {len(per_colleague) - 5} más"
+        st.warning(f"⚠️ {len(overlaps)} de los días nuevos coinciden con vacaciones de: {names}")
+    
+    max_absent = get_setting("TEAM_MAX_ABSENT")
+    if max_absent:
+        # Contando a este usuario
+        over = [day for day in days if team.index.count(day, among=colleagues) + 1 > int(max_absent)]
+        if over:
+            st.warning(f"⚠️ Se superaría el máximo de {max_absent} personas de vacaciones a la vez el {format_days(over)}")
+
+MONTH_NAMES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+WEEKDAY_LETTERS = "LMXJVSD"
+
+def show_team_view(username, selected_year):
+    """Vacaciones de todo el equipo en un mes"""
+    st.markdown("---")
+    st.header("👥 Disponibilidad del Equipo")
+    
+    team = get_team_availability()
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        today = date.today()
+        month = st.selectbox(
+            "Mes:",
+            range(1, 13),
+            index=today.month - 1 if selected_year == today.year else 0,
+            format_func=lambda m: MONTH_NAMES[m - 1],
+            key="team_month"
+        )
+    with col2:
+        own_company = st.checkbox("Solo mi empresa", value=True, key="team_own_company")
+        only_absent = st.checkbox("Solo quien tiene vacaciones este mes", value=True, key="team_only_absent")
+    with col3:
+        force = st.button("🔄 Actualizar", key="team_refresh")
+    
+    try:
+        with timed("team_load"):
+            team.refresh(get_credentials().usernames(), max_age=0 if force else None)
+    except StorageError as e:
+        st.error(f"❌ No se pudieron cargar las vacaciones del equipo: {e}")
+        return
+    company = team.summary(username).get("company") if own_company else None
+    members = team.members(company)
+    
+    start = date(selected_year, month, 1)
+    end = date(selected_year + 1, 1, 1) if month == 12 else date(selected_year, month + 1, 1)
+    with timed("team_matrix"):
+        members, absent = team.year(selected_year).between(start, end, members)
+    per_day = absent.sum(axis=0)
+    days = [start + timedelta(days=offset) for offset in range(absent.shape[1])]
+    
+    max_absent = get_setting("TEAM_MAX_ABSENT")
+    if max_absent:
+        busy = team.index.busy_days(start, end - timedelta(days=1), int(max_absent), among=set(members))
+        if busy:
+            st.warning(
+                f"⚠️ Días con más de {max_absent} personas de vacaciones: "
+                + format_days([day.isoformat() for day, _ in busy])
+            )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Personas", len(members))
+    with col2:
+        busiest = int(per_day.argmax()) if len(members) else 0
+        st.metric("Máximo de ausencias", int(per_day.max()) if len(members) else 0,
+                  help=f"El {days[busiest].strftime('%d/%m/%Y')}")
+    with col3:
+        workdays = [offset for offset, day in enumerate(days) if day.weekday() < 5]
+        st.metric("Laborables sin ausencias", sum(1 for offset in workdays if per_day[offset] == 0))
+    
+    labels = [f"{day.day:02d} {WEEKDAY_LETTERS[day.weekday()]}" for day in days]
+    st.bar_chart({"Día": labels, "Ausentes": per_day}, x="Día", y="Ausentes")
+    
+    if only_absent:
+        keep = absent.any(axis=1)
+        members = [member for member, absent_this_month in zip(members, keep) if absent_this_month]
+        absent = absent[keep]
+    table = {"Persona": [team.summary(member).get("full_name") or member for member in members]}
+    for offset, label in enumerate(labels):
+        table[label] = absent[:, offset]
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+def show_debug_panel(breakdown, profiler=None):
+    """Desglose de tiempos de la ejecución actual y, si se pidió, el perfil de cProfile"""
+    with st.sidebar.expander("⏱️ Tiempos de esta ejecución", expanded=True):
+        rows = sorted(breakdown, key=lambda row: row[2], reverse=True)
+        # Lo que no está en ninguna operación medida es sobre todo la construcción de la interfaz
+        totals = {name: total for name, _, total in breakdown}
+        measured = sum(total for name, _, total in breakdown if name not in ("rerun", "main_app"))
+        if "rerun" in totals:
+            rows.append(("resto (interfaz)", 1, max(0.0, totals["rerun"] - measured)))
+        st.dataframe(
+            [{"Operación": name, "Llamadas": calls, "ms": round(total * 1000, 1)} for name, calls, total in rows],
+            use_container_width=True,
+            hide_index=True
+        )
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(25)
+            st.code(output.getvalue(), language=None)
+            # Mismo formato que Profile.dump_stats, para abrirlo con pstats o snakeviz
+            st.download_button(
+                "⬇️ Descargar perfil (.prof)",
+                marshal.dumps(profiler.stats),
+                file_name="registro_vacaciones.prof"
+            )
+
+def route():
+    """Mostrar el registro, el login o la aplicación según el estado de la sesión"""
     if check_authentication():
         if not check_session_timeout():
             return
@@ -1031,7 +1190,33 @@ def main():
         login_form()
     else:
         # Mostrar la aplicación principal
-        main_app()
+        with timed("main_app"):
+            main_app()
+
+def main():
+    """Función principal"""
+    configure_timing_log()
+    # ?profile=1 solo tiene efecto si ENABLE_PROFILING está activado
+    profiler = None
+    if st.query_params.get("profile") == "1" and is_enabled("ENABLE_PROFILING"):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
+    start_rerun()
+    try:
+        with timed("rerun"):
+            route()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        # También en las ejecuciones que acaban con st.rerun() o con una excepción
+        breakdown = finish_rerun(user=st.session_state.get('username'))
+        writer = get_metrics_writer()
+        if writer is not None:
+            writer.maybe_write()
+    
+    if st.query_params.get("debug") == "1" or is_enabled("DEBUG_PANEL"):
+        show_debug_panel(breakdown, profiler)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,29 @@
+from datetime import date
+
+import pytest
+
+from vacaciones.day_set import DaySet
+from vacaciones.document import VacationDocument
+
+
+@pytest.mark.parametrize("entry", ["", None, "NaT", "2025-02-30"])
+def test_from_iso_keeps_invalid_entries(entry):
+    days = DaySet.from_iso([entry, "2025-01-02"])
+
+    assert len(days) == 1
+    assert date(2025, 1, 2) in days
+    assert days.invalid == (entry,)
+    assert days.to_iso() == ["2025-01-02", entry]
+
+
+def test_from_iso_only_invalid_entries():
+    days = DaySet.from_iso(["", None, "NaT"])
+
+    assert len(days) == 0
+    assert days.to_iso() == ["", None, "NaT"]
+
+
+def test_document_with_empty_string_day():
+    document = VacationDocument.from_dict({"total_days": 22, "used_days": ["", "2025-01-02"]})
+
+    assert document.to_dict()["used_days"] == ["2025-01-02", ""]
@@ -0,0 +1,7 @@
+"""Lógica de dominio del gestor de vacaciones, independiente de la interfaz.
+
+Ningún módulo importa Streamlit. Las dependencias pesadas (PyMuPDF, numpy,
+requests, holidays, babel) se cargan al usarse, de modo que las herramientas
+de línea de comandos arrancan rápido; ``benchmarks/import_budget.py``
+comprueba el tiempo de importación de cada módulo.
+"""
@@ -0,0 +1,139 @@
+"""Saldo de días de vacaciones por año.
+
+Cada año da derecho a ``total_days`` días laborables (el equivalente de los
+30 días naturales del contrato) en proporción a los días trabajados ese año:
+con fecha de alta o de baja, el primer y el último año se prorratean,
+redondeando al alza. Los días que sobran de un año pueden traspasarse al
+siguiente (como mucho ``carry_over_max``) y gastarse hasta la fecha de
+caducidad; los días usados antes de esa fecha gastan primero los traspasados.
+
+``BalanceLedger`` guarda por año dos contadores (días usados y días usados
+antes de la caducidad de los traspasados) que se actualizan al añadir o
+quitar un día; el saldo de un año se calcula con ellos sin recorrer fechas.
+"""
+import calendar
+from datetime import date
+
+# Días naturales de vacaciones por año trabajado según el contrato
+NATURAL_DAYS_PER_YEAR = 30
+
+
+def _days_in_year(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def prorated_allowance(total_days, year, start_date=None, end_date=None):
+    """Días que corresponden en ``year`` por los días trabajados entre ``start_date`` y ``end_date``"""
+    first = max(date(year, 1, 1), start_date) if start_date else date(year, 1, 1)
+    last = min(date(year, 12, 31), end_date) if end_date else date(year, 12, 31)
+    worked = (last - first).days + 1
+    if worked <= 0:
+        return 0
+    # Redondeo al alza en aritmética entera
+    return -(-total_days * worked // _days_in_year(year))
+
+
+class BalancePolicy:
+    """Traspaso de días sobrantes: máximo por año y caducidad (mes, día) en el año siguiente"""
+
+    __slots__ = ("carry_over_max", "carry_over_until")
+
+    def __init__(self, carry_over_max=0, carry_over_until=(3, 31)):
+        self.carry_over_max = carry_over_max
+        self.carry_over_until = carry_over_until
+
+    def expiry(self, year):
+        """Último día en que se pueden usar en ``year`` los días traspasados del año anterior"""
+        month, day = self.carry_over_until
+        # "02-29" en un año no bisiesto: el último día del mes
+        return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+class YearBalance:
+    """Saldo de un año"""
+
+    __slots__ = ("year", "allowance", "carried_in", "used", "expired", "expires", "remaining")
+
+    def __init__(self, year, allowance, carried_in, used, expired, expires, remaining):
+        self.year = year
+        self.allowance = allowance
+        self.carried_in = carried_in
+        self.used = used
+        self.expired = expired
+        self.expires = expires
+        self.remaining = remaining
+
+
+class BalanceLedger:
+    """Contadores por año de los días usados y saldo con traspasos.
+
+    ``used_days`` es un ``DaySet``. ``add`` y ``remove`` actualizan los
+    contadores en O(1) y solo invalidan los traspasos desde ese año; sin
+    traspasos (``carry_over_max`` igual a 0) cada consulta es O(1) y con
+    ellos lo es en cuanto se ha calculado la cadena de años anteriores.
+    """
+
+    def __init__(self, total_days, used_days, start_date=None, end_date=None, policy=None):
+        self.total_days = total_days
+        self.start_date = start_date
+        self.end_date = end_date
+        self.policy = policy or BalancePolicy()
+        self.reset(used_days)
+
+    def reset(self, used_days):
+        """Recalcular los contadores desde el conjunto completo (operaciones por rango)"""
+        self._used = {}
+        self._early = {}
+        for year in used_days.years():
+            self._used[year] = used_days.count(year)
+            if self.policy.carry_over_max:
+                self._early[year] = used_days.count(year, until=self.policy.expiry(year))
+        # año → (traspasados, gastados de los traspasados, sobrantes)
+        self._chain = {}
+
+    def allowance(self, year):
+        return prorated_allowance(self.total_days, year, self.start_date, self.end_date)
+
+    def used(self, year):
+        return self._used.get(year, 0)
+
+    def _count(self, day, delta):
+        self._used[day.year] = self._used.get(day.year, 0) + delta
+        if self.policy.carry_over_max and day <= self.policy.expiry(day.year):
+            self._early[day.year] = self._early.get(day.year, 0) + delta
+        for year in [year for year in self._chain if year >= day.year]:
+            del self._chain[year]
+
+    def add(self, day):
+        """Anotar un día nuevo (que no estaba en el conjunto)"""
+        self._count(day, 1)
+
+    def remove(self, day):
+        """Anotar que se ha quitado un día que estaba en el conjunto"""
+        self._count(day, -1)
+
+    def _link(self, year):
+        """``(traspasados, gastados de los traspasados, sobrantes)`` del año"""
+        cached = self._chain.get(year)
+        if cached is not None:
+            return cached
+        first = self.start_date.year if self.start_date else min(self._used, default=year)
+        carried = 0
+        if year > first:
+            # Los años anteriores se calculan una vez y quedan en la caché
+            carried = min(self.policy.carry_over_max, max(0, self._link(year - 1)[2]))
+        carry_used = min(carried, self._early.get(year, 0))
+        leftover = self.allowance(year) - (self.used(year) - carry_used)
+        self._chain[year] = (carried, carry_used, leftover)
+        return self._chain[year]
+
+    def balance(self, year, today=None):
+        """Saldo del año ``year`` a fecha ``today`` (hoy por defecto)"""
+        today = today or date.today()
+        allowance, used = self.allowance(year), self.used(year)
+        if not self.policy.carry_over_max:
+            return YearBalance(year, allowance, 0, used, 0, None, allowance - used)
+        carried, carry_used, _ = self._link(year)
+        expires = self.policy.expiry(year)
+        expired = carried - carry_used if today > expires else 0
+        return YearBalance(year, allowance, carried, used, expired, expires, allowance + carried - used - expired)
@@ -0,0 +1,128 @@
+"""Generación masiva de informes mensuales para todos los usuarios registrados.
+
+Uso::
+
+    python -m vacaciones.bulk_reports 2025-11 --output informes/
+    python -m vacaciones.bulk_reports 2025-11 --zip informes_2025_11.zip --workers 8
+
+El almacenamiento se elige igual que en la aplicación (``STORAGE_BACKEND``,
+``STORAGE_PATH``, ``GITHUB_*`` en el entorno) o con las opciones
+``--backend``, ``--path`` y ``--api-url``; esta última permite apuntar a un
+sustituto local de la API de GitHub.
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import as_completed
+from datetime import date
+from pathlib import Path
+
+from .holiday_calendar import HolidayCalendar
+from .report import TEMPLATE_FILE, load_template, render_report, report_pool
+from .storage import get_storage
+from .team import load_documents
+from .users import UserRegistry
+
+
+def _render_timed(selected_month, document, holidays, template):
+    start = time.perf_counter()
+    pdf_bytes = render_report(selected_month, document, holidays, load_template(template))
+    return pdf_bytes, time.perf_counter() - start
+
+
+def _parse_month(value):
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Mes no válido (se espera AAAA-MM): {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m vacaciones.bulk_reports",
+        description="Genera el registro de jornada de un mes para todos los usuarios"
+    )
+    parser.add_argument("month", type=_parse_month, help="Mes del informe, AAAA-MM")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", type=Path, help="Directorio donde escribir un PDF por usuario")
+    target.add_argument("--zip", type=Path, help="Fichero ZIP donde empaquetar los informes")
+    parser.add_argument("--backend", choices=["local", "sqlite", "github"], help="Backend de almacenamiento")
+    parser.add_argument("--path", help="Directorio (local) o base de datos (sqlite)")
+    parser.add_argument("--api-url", help="URL base de la API de GitHub o de un sustituto local")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos de renderizado")
+    parser.add_argument("--template", default=TEMPLATE_FILE, help="Plantilla PDF")
+    return parser
+
+
+def _config(args):
+    config = {}
+    if args.backend:
+        config["STORAGE_BACKEND"] = args.backend
+    if args.path:
+        config["STORAGE_PATH"] = args.path
+    if args.api_url:
+        config["GITHUB_API_URL"] = args.api_url
+    return config
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    backend = get_storage(_config(args))
+    usernames = sorted(UserRegistry(backend).passwords())
+    selected_month = args.month
+
+    started = time.perf_counter()
+    # La lectura es E/S: se hace con hilos antes de repartir el renderizado entre procesos
+    documents = load_documents(backend, usernames, workers=max(4, args.workers * 2))
+    loaded = time.perf_counter()
+
+    if args.output:
+        args.output.mkdir(parents=True, exist_ok=True)
+    archive = zipfile.ZipFile(args.zip, "w", zipfile.ZIP_DEFLATED) if args.zip else None
+
+    timings = {}
+    failures = {}
+    with report_pool(args.workers) as pool:
+        futures = {}
+        for username, document in documents.items():
+            if document is None:
+                failures[username] = "sin datos de vacaciones"
+                continue
+            holidays = dict(HolidayCalendar(selected_month.year, document.holiday_map()))
+            future = pool.submit(_render_timed, selected_month, document, holidays, args.template)
+            futures[future] = username
+
+        for future in as_completed(futures):
+            username = futures[future]
+            try:
+                pdf_bytes, seconds = future.result()
+            except Exception as e:
+                failures[username] = str(e)
+                continue
+            file_name = f"{username}_{selected_month.year}_{selected_month.month:02d}_registro.pdf"
+            if archive is not None:
+                archive.writestr(file_name, pdf_bytes)
+            else:
+                (args.output / file_name).write_bytes(pdf_bytes)
+            timings[username] = seconds
+            print(f"{username:<24} {seconds * 1000:8.1f} ms")
+
+    if archive is not None:
+        archive.close()
+    elapsed = time.perf_counter() - started
+
+    for username, reason in sorted(failures.items()):
+        print(f"{username:<24} ERROR: {reason}", file=sys.stderr)
+    rate = len(timings) / elapsed if elapsed else 0
+    print(
+        f"{len(timings)} informes en {elapsed:.2f} s ({rate:.1f} informes/s; "
+        f"carga de datos {loaded - started:.2f} s, {args.workers} procesos)"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
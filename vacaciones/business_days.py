@@ -0,0 +1,51 @@
+"""Días laborables con numpy: expansión de rangos como operaciones sobre arrays"""
+from datetime import date, timedelta
+
+import numpy as np
+
+WEEKMASK = "1111100"
+ONE_DAY = np.timedelta64(1, "D")
+
+
+def to_datetime64(days):
+    """Convertir fechas (``date`` o cadenas ISO) en un array ``datetime64[D]``.
+
+    Las cadenas que no son fechas válidas se descartan, también las que numpy
+    convierte en NaT (``""``, ``None``, ``"NaT"``).
+    """
+    days = list(days)
+    try:
+        result = np.array(days, dtype="datetime64[D]")
+    except ValueError:
+        valid = []
+        for day in days:
+            try:
+                valid.append(np.datetime64(day, "D"))
+            except ValueError:
+                pass
+        result = np.array(valid, dtype="datetime64[D]")
+    return result[~np.isnat(result)]
+
+
+def to_iso(days):
+    """Lista de cadenas ``YYYY-MM-DD`` a partir de un array ``datetime64[D]``"""
+    return np.datetime_as_string(days, unit="D").tolist()
+
+
+class BusinessCalendar:
+    """Calendario laborable de lunes a viernes, opcionalmente sin los festivos dados"""
+
+    def __init__(self, holidays=()):
+        self._calendar = np.busdaycalendar(weekmask=WEEKMASK, holidays=to_datetime64(holidays))
+
+    def days(self, start, end):
+        """Días laborables entre ``start`` y ``end`` (ambos incluidos)"""
+        span = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + ONE_DAY, dtype="datetime64[D]")
+        return span[np.is_busday(span, busdaycal=self._calendar)]
+
+
+def month_bounds(year, month):
+    """Primer y último día de un mes"""
+    first = date(year, month, 1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
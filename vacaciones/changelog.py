@@ -0,0 +1,395 @@
+"""Registro de cambios de los documentos de vacaciones.
+
+En lugar de reescribir ``vacation_data_<usuario>.json`` en cada edición,
+``ChangeLogStorage`` guarda la diferencia con la versión anterior como un
+evento en un fichero nuevo, ``vacation_data_<usuario>.log/<n>.json``, creado
+con compare-and-swap: si otro proceso ya escribió el evento ``n``, se leen los
+eventos nuevos, se recalcula la diferencia y se reintenta con el siguiente.
+El tamaño de cada escritura depende del cambio, no del historial.
+
+El documento se obtiene del último snapshot (el propio
+``vacation_data_<usuario>.json``, cuyo campo ``log_seq`` indica el último
+evento incluido) más los eventos posteriores; cuando hay ``compact_after``
+eventos tras el snapshot se escribe uno nuevo, al guardar o al leer. Los eventos no se borran y el primero incluye
+el documento completo, así que ``state_at`` reconstruye cualquier versión.
+
+Operaciones de un evento::
+
+    {"op": "reset", "data": {...}}                     documento completo
+    {"op": "add_days" | "remove_days", "days": [...]}
+    {"op": "add_holidays", "holidays": [...]}
+    {"op": "remove_holidays", "dates": [...]}
+    {"op": "set", "field": ..., "value": ...}
+    {"op": "unset", "field": ...}
+
+Uso::
+
+    python -m vacaciones.changelog history usuario
+    python -m vacaciones.changelog show usuario --at 2025-06-01T12:00
+    python -m vacaciones.changelog compact
+
+``get_storage`` solo usa el registro con los backends local y sqlite: en
+GitHub cada evento costaría una petición más por lectura. Los registros que
+ya existan en GitHub se incorporan al snapshot con
+``python -m vacaciones.changelog --backend github compact``.
+"""
+import argparse
+import copy
+import json
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from .storage import ConflictError, MirroredStorage, StorageBackend, StorageError
+
+LOGGED_PREFIX = "vacation_data_"
+SEQ_FIELD = "log_seq"
+
+
+def is_logged(name):
+    """Documentos cuyos cambios se guardan como eventos"""
+    return name.startswith(LOGGED_PREFIX) and name.endswith(".json") and "/" not in name
+
+
+def log_name(name, seq):
+    """Fichero del evento ``seq`` del documento ``name``"""
+    return f"{name[:-len('.json')]}.log/{seq:06d}.json"
+
+
+def _holiday_date(holiday):
+    # Formato antiguo: solo la fecha
+    return holiday["date"] if isinstance(holiday, dict) else holiday
+
+
+def _diff_days(old, new):
+    old_days, new_days = set(old), set(new)
+    added, removed = sorted(new_days - old_days), sorted(old_days - new_days)
+    if len(added) + len(removed) > len(new_days):
+        # Ocupa menos la lista completa (p. ej. al resetear las vacaciones)
+        return [{"op": "set", "field": "used_days", "value": sorted(new_days)}]
+    ops = []
+    if removed:
+        ops.append({"op": "remove_days", "days": removed})
+    if added:
+        ops.append({"op": "add_days", "days": added})
+    return ops
+
+
+def _diff_holidays(old, new):
+    old_by_date = {_holiday_date(holiday): holiday for holiday in old}
+    new_by_date = {_holiday_date(holiday): holiday for holiday in new}
+    removed = [fecha for fecha, holiday in old_by_date.items() if new_by_date.get(fecha) != holiday]
+    added = [holiday for fecha, holiday in new_by_date.items() if old_by_date.get(fecha) != holiday]
+    ops = []
+    if removed:
+        ops.append({"op": "remove_holidays", "dates": removed})
+    if added:
+        ops.append({"op": "add_holidays", "holidays": copy.deepcopy(added)})
+    return ops
+
+
+# Campos con diferencia por elementos; el resto se guarda entero con "set"
+FIELD_DIFFS = {
+    "used_days": _diff_days,
+    "custom_holidays": _diff_holidays,
+}
+
+
+def diff(old, new):
+    """Operaciones que convierten el documento ``old`` (o None) en ``new``"""
+    if not old:
+        return [{"op": "reset", "data": copy.deepcopy(new)}]
+    ops = []
+    for field in sorted(old.keys() | new.keys()):
+        if field not in new:
+            ops.append({"op": "unset", "field": field})
+        elif old.get(field) == new[field]:
+            continue
+        elif field in old and field in FIELD_DIFFS:
+            ops += FIELD_DIFFS[field](old[field], new[field])
+        else:
+            ops.append({"op": "set", "field": field, "value": copy.deepcopy(new[field])})
+    return ops
+
+
+def apply(data, ops):
+    """Aplicar ``ops`` sobre ``data`` (se modifica) y devolver el resultado"""
+    for op in ops:
+        kind = op["op"]
+        if kind == "reset":
+            data = copy.deepcopy(op["data"])
+        elif kind == "set":
+            data[op["field"]] = copy.deepcopy(op["value"])
+        elif kind == "unset":
+            data.pop(op["field"], None)
+        elif kind == "add_days":
+            data["used_days"] = sorted(set(data.get("used_days", [])).union(op["days"]))
+        elif kind == "remove_days":
+            removed = set(op["days"])
+            data["used_days"] = [day for day in data.get("used_days", []) if day not in removed]
+        elif kind == "add_holidays":
+            added = {_holiday_date(holiday) for holiday in op["holidays"]}
+            kept = [holiday for holiday in data.get("custom_holidays", []) if _holiday_date(holiday) not in added]
+            data["custom_holidays"] = kept + copy.deepcopy(op["holidays"])
+        elif kind == "remove_holidays":
+            removed = set(op["dates"])
+            data["custom_holidays"] = [
+                holiday for holiday in data.get("custom_holidays", []) if _holiday_date(holiday) not in removed
+            ]
+        else:
+            raise ValueError(f"Operación desconocida en el registro de cambios: {kind}")
+    return data
+
+
+class LogState:
+    """Documento materializado hasta el evento ``seq``"""
+
+    __slots__ = ("data", "seq", "snapshot_seq")
+
+    def __init__(self, data, seq, snapshot_seq):
+        self.data = data
+        self.seq = seq
+        self.snapshot_seq = snapshot_seq
+
+
+class ChangeLogStorage(StorageBackend):
+    """Backend que guarda los cambios de los documentos de vacaciones como eventos.
+
+    El resto de documentos pasan sin cambios al backend envuelto. ``load``
+    devuelve el documento con ``log_seq``, el último evento que incluye; al
+    guardarlo, ``save`` calcula la diferencia con esa versión y la aplica
+    sobre la actual, de modo que no deshace los cambios hechos entretanto
+    por otra sesión. Si esa versión ya no está en memoria (se guardan las
+    ``keep`` últimas de cada documento) se compara con la actual.
+    """
+
+    def __init__(self, backend, compact_after=50, retries=5, keep=32):
+        self.backend = backend
+        self.compact_after = compact_after
+        self.retries = retries
+        self.keep = keep
+        self._states = {}
+        # nombre → OrderedDict(seq → documento) con las últimas versiones entregadas
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _state(self, name):
+        with self._lock:
+            state = self._states.get(name)
+        if state is None:
+            snapshot = self.backend.load(name)
+            seq = snapshot.pop(SEQ_FIELD, 0) if snapshot is not None else 0
+            state = LogState(snapshot, seq, seq)
+
+        data, seq = state.data, state.seq
+        while True:
+            event = self.backend.load(log_name(name, seq + 1))
+            if event is None:
+                break
+            if data is state.data:
+                # El estado en memoria lo comparten todas las sesiones: no modificarlo
+                data = copy.deepcopy(data) if data is not None else {}
+            data = apply(data, event["ops"])
+            seq += 1
+        return self._remember(name, LogState(data, seq, state.snapshot_seq))
+
+    def _remember(self, name, state):
+        with self._lock:
+            versions = self._versions.setdefault(name, OrderedDict())
+            versions[state.seq] = state.data
+            versions.move_to_end(state.seq)
+            while len(versions) > self.keep:
+                versions.popitem(last=False)
+            current = self._states.get(name)
+            if current is None or current.seq <= state.seq:
+                self._states[name] = state
+                return state
+            return current
+
+    def _version(self, name, seq):
+        with self._lock:
+            versions = self._versions.get(name)
+            return versions.get(seq) if versions is not None else None
+
+    def load(self, name):
+        if not is_logged(name):
+            return self.backend.load(name)
+        state = self._state(name)
+        if state.seq - state.snapshot_seq >= self.compact_after:
+            # Cola larga (p. ej. eventos escritos por otro proceso): compactar para leer menos
+            try:
+                self.compact(name)
+            except StorageError:
+                pass
+        if state.data is None:
+            return None
+        data = copy.deepcopy(state.data)
+        data[SEQ_FIELD] = state.seq
+        return data
+
+    def save(self, name, data, message):
+        if not is_logged(name):
+            self.backend.save(name, data, message)
+            return
+        data = dict(data)
+        base_seq = data.pop(SEQ_FIELD, None)
+        base = self._version(name, base_seq) if base_seq is not None else None
+        for _ in range(self.retries):
+            state = self._state(name)
+            ops = diff(base if base is not None else state.data, data)
+            if state.seq == 0 and state.data:
+                # Primer evento de un documento anterior al registro: incluir el original
+                ops = [{"op": "reset", "data": copy.deepcopy(state.data)}] + ops
+            if not ops:
+                return
+            seq = state.seq + 1
+            event = {"seq": seq, "at": datetime.now().isoformat(timespec="seconds"), "message": message, "ops": ops}
+            try:
+                self.backend.compare_and_swap(log_name(name, seq), event, message, None)
+            except ConflictError:
+                # Otro proceso escribió antes el evento: aplicar el cambio sobre la versión nueva
+                continue
+            base = copy.deepcopy(state.data) if state.data is not None else {}
+            state = self._remember(name, LogState(apply(base, ops), seq, state.snapshot_seq))
+            if state.seq - state.snapshot_seq >= self.compact_after:
+                try:
+                    self.compact(name)
+                except StorageError:
+                    # El evento ya está guardado; se compactará en la próxima escritura
+                    pass
+            return
+        raise ConflictError(name)
+
+    def load_versioned(self, name):
+        if not is_logged(name):
+            return self.backend.load_versioned(name)
+        return super().load_versioned(name)
+
+    def compare_and_swap(self, name, data, message, expected):
+        if not is_logged(name):
+            return self.backend.compare_and_swap(name, data, message, expected)
+        return super().compare_and_swap(name, data, message, expected)
+
+    def compact(self, name):
+        """Escribir un snapshot con todos los eventos; devuelve False si no hacía falta"""
+        state = self._state(name)
+        if state.data is None or state.seq == state.snapshot_seq:
+            return False
+        # Puede que otro proceso ya lo haya compactado
+        current = self.backend.load(name)
+        if current is None or current.get(SEQ_FIELD, 0) < state.seq:
+            snapshot = dict(state.data)
+            snapshot[SEQ_FIELD] = state.seq
+            self.backend.save(name, snapshot, f"🗜️ Compactación del registro de {name}")
+        self._remember(name, LogState(state.data, state.seq, state.seq))
+        return True
+
+    def history(self, name, since=0):
+        """Eventos de ``name`` posteriores al evento ``since``, en orden"""
+        seq = since + 1
+        while True:
+            event = self.backend.load(log_name(name, seq))
+            if event is None:
+                return
+            yield event
+            seq += 1
+
+    def state_at(self, name, when):
+        """Documento tras el último evento anterior a ``when`` (datetime o número de evento).
+
+        Devuelve None si ``when`` es anterior al primer evento.
+        """
+        data = None
+        for event in self.history(name):
+            position = event["seq"] if isinstance(when, int) else datetime.fromisoformat(event["at"])
+            if position > when:
+                break
+            data = apply(data if data is not None else {}, event["ops"])
+        if data is None and next(self.history(name), None) is None:
+            # Documento sin eventos: el snapshot es su única versión
+            return self.backend.load(name)
+        return data
+
+
+def describe(ops):
+    """Resumen legible de las operaciones de un evento"""
+    parts = []
+    for op in ops:
+        kind = op["op"]
+        if kind == "reset":
+            parts.append("documento completo")
+        elif kind in ("add_days", "remove_days"):
+            parts.append(f"{'+' if kind == 'add_days' else '-'}{len(op['days'])} días")
+        elif kind == "add_holidays":
+            parts.append(f"+{len(op['holidays'])} festivos")
+        elif kind == "remove_holidays":
+            parts.append(f"-{len(op['dates'])} festivos")
+        elif kind == "set":
+            value = op["value"]
+            parts.append(f"{op['field']}={value if not isinstance(value, list) else f'[{len(value)}]'}")
+        elif kind == "unset":
+            parts.append(f"sin {op['field']}")
+    return ", ".join(parts)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m vacaciones.changelog",
+        description="Historial y compactación del registro de cambios de vacaciones"
+    )
+    parser.add_argument("--backend", choices=["local", "sqlite", "github"], help="Backend de almacenamiento")
+    parser.add_argument("--path", help="Directorio (local) o base de datos (sqlite)")
+    parser.add_argument("--api-url", help="URL base de la API de GitHub o de un sustituto local")
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("history", help="Mostrar los cambios de un usuario")
+    history.add_argument("username")
+    show = commands.add_parser("show", help="Mostrar el documento de un usuario en un momento dado")
+    show.add_argument("username")
+    show.add_argument("--at", help="Fecha y hora ISO (por defecto, ahora)")
+    show.add_argument("--seq", type=int, help="Número de evento")
+    compact = commands.add_parser("compact", help="Compactar el registro de los usuarios indicados (o de todos)")
+    compact.add_argument("usernames", nargs="*")
+    return parser
+
+
+def main(argv=None):
+    from .storage import get_storage
+    from .users import UserRegistry
+
+    args = build_parser().parse_args(argv)
+    config = {}
+    if args.backend:
+        config["STORAGE_BACKEND"] = args.backend
+    if args.path:
+        config["STORAGE_PATH"] = args.path
+    if args.api_url:
+        config["GITHUB_API_URL"] = args.api_url
+    backend = get_storage(config)
+    if isinstance(backend, MirroredStorage):
+        # El espejo ya tiene los documentos completos
+        backend = backend.primary
+    if not isinstance(backend, ChangeLogStorage):
+        # GitHub no usa el registro, pero puede conservar eventos de versiones anteriores
+        backend = ChangeLogStorage(backend)
+
+    if args.command == "history":
+        for event in backend.history(f"{LOGGED_PREFIX}{args.username}.json"):
+            print(f"{event['seq']:6d}  {event['at']}  {event['message']}  ({describe(event['ops'])})")
+    elif args.command == "show":
+        when = args.seq if args.seq is not None else (datetime.fromisoformat(args.at) if args.at else datetime.now())
+        data = backend.state_at(f"{LOGGED_PREFIX}{args.username}.json", when)
+        if data is None:
+            print("Sin datos en ese momento", file=sys.stderr)
+            return 1
+        print(json.dumps(data, indent=4, ensure_ascii=False))
+    else:
+        usernames = args.usernames or sorted(UserRegistry(backend).passwords())
+        for username in usernames:
+            compacted = backend.compact(f"{LOGGED_PREFIX}{username}.json")
+            print(f"{username:<24} {'compactado' if compacted else 'sin cambios'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Conjunto de días representado como un mapa de bits de 366 posiciones por año"""
+from datetime import date
+
+import numpy as np
+
+from .business_days import to_datetime64, to_iso
+
+YEAR_BITS = 366
+_YEAR_BYTES = (YEAR_BITS + 7) // 8
+
+
+def _bits_from_offsets(offsets):
+    """Mapa de bits (entero) con los bits ``offsets`` activos"""
+    bits = np.zeros(_YEAR_BYTES * 8, dtype=np.uint8)
+    bits[offsets] = 1
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def _offsets_from_bits(mask):
+    """Posiciones de los bits activos de ``mask`` en orden creciente"""
+    raw = np.frombuffer(mask.to_bytes(_YEAR_BYTES, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+def _year_start(year):
+    return np.datetime64(f"{year:04d}-01-01", "D")
+
+
+def _as_date(day):
+    if isinstance(day, str):
+        return date.fromisoformat(day)
+    if isinstance(day, np.datetime64):
+        return day.astype(date)
+    return day
+
+
+class DaySet:
+    """Conjunto de fechas con un entero de 366 bits por año.
+
+    La pertenencia, las altas y bajas y el recuento por año son O(1); la
+    unión y la diferencia se hacen año a año con operaciones de bits. Las
+    entradas que no son fechas válidas se conservan tal cual para que la
+    conversión desde y hacia la lista de cadenas ISO no pierda datos.
+    """
+
+    __slots__ = ("_years", "invalid")
+
+    def __init__(self, years=None, invalid=()):
+        self._years = {year: mask for year, mask in (years or {}).items() if mask}
+        self.invalid = tuple(invalid)
+
+    @classmethod
+    def from_datetime64(cls, days):
+        """Crear el conjunto a partir de un array ``datetime64[D]``"""
+        days = np.unique(np.asarray(days, dtype="datetime64[D]"))
+        if not len(days):
+            return cls()
+        years = days.astype("datetime64[Y]")
+        offsets = (days - years.astype("datetime64[D]")).astype(np.int64)
+        year_numbers = years.astype(np.int64) + 1970
+        masks = {}
+        for year in np.unique(year_numbers):
+            masks[int(year)] = _bits_from_offsets(offsets[year_numbers == year])
+        return cls(masks)
+
+    @classmethod
+    def from_iso(cls, strings):
+        """Crear el conjunto desde la lista ``used_days`` del JSON"""
+        strings = list(strings)
+        days = to_datetime64(strings)
+        invalid = ()
+        if len(days) != len(strings):
+            valid = set(to_iso(days))
+            invalid = tuple(s for s in strings if s not in valid)
+        result = cls.from_datetime64(days)
+        result.invalid = invalid
+        return result
+
+    @classmethod
+    def from_range(cls, start, end):
+        """Todos los días entre ``start`` y ``end`` (ambos incluidos)"""
+        start, end = _as_date(start), _as_date(end)
+        masks = {}
+        for year in range(start.year, end.year + 1):
+            first = (start - date(year, 1, 1)).days if year == start.year else 0
+            last = (end - date(year, 1, 1)).days if year == end.year else (date(year, 12, 31) - date(year, 1, 1)).days
+            masks[year] = ((1 << (last - first + 1)) - 1) << first
+        return cls(masks)
+
+    def to_iso(self):
+        """Lista ordenada de cadenas ISO, en el formato de ``used_days``"""
+        return to_iso(self.to_datetime64()) + list(self.invalid)
+
+    def to_datetime64(self):
+        """Array ordenado ``datetime64[D]`` con todas las fechas"""
+        parts = [_year_start(year) + _offsets_from_bits(mask) for year, mask in sorted(self._years.items())]
+        return np.concatenate(parts) if parts else np.array([], dtype="datetime64[D]")
+
+    def days(self, year):
+        """Fechas (``date``) de un año, en orden"""
+        mask = self._years.get(year, 0)
+        return (_year_start(year) + _offsets_from_bits(mask)).tolist() if mask else []
+
+    def count(self, year, until=None):
+        """Número de fechas de un año (solo hasta ``until`` incluido, si se indica)"""
+        mask = self._years.get(year, 0)
+        if until is not None:
+            offset = until.toordinal() - date(year, 1, 1).toordinal()
+            mask &= (1 << (offset + 1)) - 1 if offset >= 0 else 0
+        return mask.bit_count()
+
+    def years(self):
+        return sorted(self._years)
+
+    def __contains__(self, day):
+        try:
+            day = _as_date(day)
+        except ValueError:
+            return day in self.invalid
+        return bool(self._years.get(day.year, 0) >> (day.toordinal() - date(day.year, 1, 1).toordinal()) & 1)
+
+    def __len__(self):
+        return sum(mask.bit_count() for mask in self._years.values())
+
+    def __eq__(self, other):
+        return isinstance(other, DaySet) and self._years == other._years and set(self.invalid) == set(other.invalid)
+
+    def add(self, day):
+        day = _as_date(day)
+        offset = day.toordinal() - date(day.year, 1, 1).toordinal()
+        self._years[day.year] = self._years.get(day.year, 0) | (1 << offset)
+
+    def discard(self, day):
+        day = _as_date(day)
+        offset = day.toordinal() - date(day.year, 1, 1).toordinal()
+        mask = self._years.get(day.year, 0) & ~(1 << offset)
+        if mask:
+            self._years[day.year] = mask
+        else:
+            self._years.pop(day.year, None)
+
+    def __or__(self, other):
+        years = dict(self._years)
+        for year, mask in other._years.items():
+            years[year] = years.get(year, 0) | mask
+        return DaySet(years, self.invalid + tuple(s for s in other.invalid if s not in self.invalid))
+
+    def __sub__(self, other):
+        return DaySet({year: mask & ~other._years.get(year, 0) for year, mask in self._years.items()}, self.invalid)
@@ -0,0 +1,137 @@
+"""Datos derivados de un documento de vacaciones, reutilizables entre ejecuciones.
+
+El estado se guarda en la sesión junto con el ``VacationDocument`` del que se
+calcula y la versión (hash del contenido) que tenía el documento.
+El saldo de cada año lo lleva un ``BalanceLedger`` con contadores por año.
+Mientras la versión no cambie, una nueva ejecución del script lo reutiliza; los
+datos de cada año (festivos, eventos del calendario, resumen) se calculan la
+primera vez que se piden y se guardan ordenados por fecha, de modo que los
+eventos de un rango se obtienen sin recorrer el año. Añadir o quitar un día
+los actualiza (junto con los contadores del saldo) sin reconstruirlos.
+"""
+import bisect
+from datetime import date
+
+from .balances import BalanceLedger
+from .events import holiday_event, vacation_event
+from .holiday_calendar import HolidayCalendar
+
+
+def _as_date(day):
+    return date.fromisoformat(day) if isinstance(day, str) else day
+
+
+class YearView:
+    """Festivos y días de vacaciones de un año, ordenados por fecha"""
+
+    __slots__ = ("year", "holidays", "_holiday_dates", "_holiday_events", "_vacation_dates")
+
+    def __init__(self, year, used_days, custom_days):
+        self.year = year
+        self.holidays = HolidayCalendar(year, custom_days)
+        # HolidayCalendar itera en orden de fecha
+        self._holiday_dates = list(self.holidays)
+        self._holiday_events = [holiday_event(fecha, self.holidays[fecha]) for fecha in self._holiday_dates]
+        self._vacation_dates = used_days.days(year)
+
+    def events_between(self, start, end):
+        """Eventos de las fechas en ``[start, end)``"""
+        first = bisect.bisect_left(self._holiday_dates, start)
+        last = bisect.bisect_left(self._holiday_dates, end)
+        events = self._holiday_events[first:last]
+        first = bisect.bisect_left(self._vacation_dates, start)
+        last = bisect.bisect_left(self._vacation_dates, end)
+        events.extend(vacation_event(fecha) for fecha in self._vacation_dates[first:last])
+        return events
+
+    def vacation_days(self):
+        """Días de vacaciones del año, en orden"""
+        return list(self._vacation_dates)
+
+    def add(self, day):
+        index = bisect.bisect_left(self._vacation_dates, day)
+        if day.year == self.year and self._vacation_dates[index:index + 1] != [day]:
+            self._vacation_dates.insert(index, day)
+
+    def discard(self, day):
+        index = bisect.bisect_left(self._vacation_dates, day)
+        if self._vacation_dates[index:index + 1] == [day]:
+            del self._vacation_dates[index]
+
+
+class DerivedState:
+    """Días usados, saldo y vistas por año de un documento de vacaciones"""
+
+    __slots__ = ("key", "document", "ledger", "_years")
+
+    def __init__(self, document, policy=None):
+        self.key = document.version
+        self.document = document
+        self.ledger = BalanceLedger(
+            document.total_days,
+            document.used_days,
+            start_date=document.start_date,
+            end_date=document.end_date,
+            policy=policy
+        )
+        self._years = {}
+
+    @property
+    def used_days(self):
+        return self.document.used_days
+
+    @property
+    def total_days(self):
+        return self.document.total_days
+
+    def is_current(self, document):
+        """Si el estado corresponde todavía a ``document`` y a su versión"""
+        return document is self.document and self.key == document.version
+
+    def balance(self, year, today=None):
+        """Saldo del año ``year`` (``YearBalance``)"""
+        return self.ledger.balance(year, today)
+
+    def year(self, year):
+        """Vista del año, calculada la primera vez que se pide"""
+        view = self._years.get(year)
+        if view is None:
+            view = self._years[year] = YearView(year, self.used_days, self.document.holiday_map())
+        return view
+
+    def events_between(self, start, end):
+        """Eventos del calendario de las fechas en ``[start, end)``"""
+        events = []
+        for year in range(start.year, end.year + 1):
+            events.extend(self.year(year).events_between(start, end))
+        return events
+
+    def add_day(self, day):
+        """Añadir un día de vacaciones"""
+        day = _as_date(day)
+        if day in self.used_days:
+            return
+        self.used_days.add(day)
+        self.ledger.add(day)
+        for view in self._years.values():
+            view.add(day)
+
+    def remove_day(self, day):
+        """Quitar un día de vacaciones"""
+        day = _as_date(day)
+        if day not in self.used_days:
+            return
+        self.used_days.discard(day)
+        self.ledger.remove(day)
+        for view in self._years.values():
+            view.discard(day)
+
+    def replace_used_days(self, used_days):
+        """Sustituir el conjunto completo de días (operaciones por rango)"""
+        self.document.used_days = used_days
+        self.ledger.reset(used_days)
+        self._years.clear()
+
+    def commit(self):
+        """Anotar la versión del documento tras guardarlo con ``encode``"""
+        self.key = self.document.version
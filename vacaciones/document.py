@@ -0,0 +1,192 @@
+"""Documento de vacaciones de un usuario, decodificado una vez por versión.
+
+``VacationDocument.from_dict`` convierte el JSON guardado en objetos con
+``__slots__``: las fechas de alta y baja y las de los festivos personalizados
+se guardan como ordinales, los días usados como ``DaySet`` y los festivos
+antiguos guardados como cadena se convierten en ``CustomHoliday`` al leerlos.
+``to_dict`` devuelve el JSON normalizado con ``schema_version``; los campos
+que el modelo no conoce (``log_seq`` del registro de cambios, por ejemplo)
+se conservan tal cual.
+
+Versiones del esquema:
+
+1. Sin ``schema_version``; festivos como ``{"date", "name"}`` o como cadena.
+2. Festivos siempre como ``{"date", "name"}``, ordenados y uno por fecha;
+   días usados ordenados.
+"""
+import bisect
+import copy
+from datetime import date
+from types import MappingProxyType
+
+from .holiday_calendar import CUSTOM_HOLIDAY_NAME, normalize_custom_holiday
+from .storage import content_version
+
+SCHEMA_VERSION = 2
+
+# Campos de texto de la ficha, en el orden en que se guardan
+PROFILE_FIELDS = ("full_name", "nif", "workplace", "company")
+
+_KNOWN_FIELDS = ("schema_version", "total_days", "used_days", "custom_holidays", "start_date", "end_date") + PROFILE_FIELDS
+
+
+def _ordinal(value):
+    """Ordinal de una fecha ISO; None si falta o no es válida"""
+    try:
+        return date.fromisoformat(value).toordinal() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _ordinal_of(holiday):
+    return holiday.ordinal
+
+
+class CustomHoliday:
+    """Festivo personalizado: ordinal de la fecha y nombre"""
+
+    __slots__ = ("ordinal", "name")
+
+    def __init__(self, ordinal, name=CUSTOM_HOLIDAY_NAME):
+        self.ordinal = ordinal
+        self.name = name
+
+    @property
+    def date(self):
+        return date.fromordinal(self.ordinal)
+
+    def to_dict(self):
+        return {"date": self.date.isoformat(), "name": self.name}
+
+
+class VacationDocument:
+    """Días usados, festivos personalizados y ficha de un usuario.
+
+    ``version`` es el hash del JSON del que se decodificó (o del último
+    ``encode``); sirve para reutilizar el documento y los datos derivados
+    mientras lo guardado no cambie.
+    """
+
+    __slots__ = (
+        "schema_version", "total_days", "used_days", "custom_holidays", "start", "end",
+        "full_name", "nif", "workplace", "company", "invalid_holidays", "extra", "version", "_holiday_map"
+    )
+
+    @classmethod
+    def from_dict(cls, data, version=None):
+        """Decodificar el JSON guardado (``version``: su ``content_version``, si ya se conoce)"""
+        from .day_set import DaySet
+
+        document = cls()
+        document.schema_version = data.get("schema_version", 1)
+        document.total_days = data.get("total_days", 0)
+        document.used_days = DaySet.from_iso(data.get("used_days") or [])
+        document.start = _ordinal(data.get("start_date"))
+        document.end = _ordinal(data.get("end_date"))
+        for field in PROFILE_FIELDS:
+            setattr(document, field, data.get(field) or "")
+
+        holidays = {}
+        invalid = []
+        for entry in data.get("custom_holidays") or []:
+            try:
+                day, name = normalize_custom_holiday(entry)
+            except (KeyError, TypeError):
+                invalid.append(entry)
+                continue
+            ordinal = _ordinal(day)
+            if ordinal is None:
+                invalid.append(entry)
+            else:
+                # Una entrada por fecha: gana la primera, como al importar
+                holidays.setdefault(ordinal, CustomHoliday(ordinal, name))
+        document.set_holidays(holidays.values())
+        document.invalid_holidays = tuple(invalid)
+
+        document.extra = {key: value for key, value in data.items() if key not in _KNOWN_FIELDS}
+        document.version = version or content_version(data)
+        return document
+
+    @classmethod
+    def new(cls, total_days, **profile):
+        """Documento vacío de un usuario nuevo"""
+        return cls.from_dict({"schema_version": SCHEMA_VERSION, "total_days": total_days, **profile})
+
+    def to_dict(self):
+        """JSON normalizado para guardar"""
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "total_days": self.total_days,
+            "used_days": self.used_days.to_iso(),
+            "custom_holidays": [holiday.to_dict() for holiday in self.custom_holidays] + list(self.invalid_holidays),
+        }
+        for field in PROFILE_FIELDS:
+            data[field] = getattr(self, field)
+        if self.start is not None:
+            data["start_date"] = self.start_date.isoformat()
+        if self.end is not None:
+            data["end_date"] = self.end_date.isoformat()
+        data.update(self.extra)
+        return data
+
+    def encode(self):
+        """``to_dict`` y anotar su versión: la que tendrá el documento al volver a leerlo"""
+        data = self.to_dict()
+        self.version = content_version(data)
+        return data
+
+    def copy(self):
+        """Copia que se puede modificar sin afectar a esta (los festivos son inmutables)"""
+        from .day_set import DaySet
+
+        document = copy.copy(self)
+        document.used_days = self.used_days | DaySet()
+        document.extra = dict(self.extra)
+        return document
+
+    @property
+    def start_date(self):
+        """Fecha de alta (None si no consta)"""
+        return date.fromordinal(self.start) if self.start is not None else None
+
+    @start_date.setter
+    def start_date(self, value):
+        self.start = value.toordinal() if value else None
+
+    @property
+    def end_date(self):
+        """Fecha de baja (None si no consta)"""
+        return date.fromordinal(self.end) if self.end is not None else None
+
+    @end_date.setter
+    def end_date(self, value):
+        self.end = value.toordinal() if value else None
+
+    def set_holidays(self, holidays):
+        """Sustituir los festivos personalizados"""
+        self.custom_holidays = tuple(sorted(holidays, key=_ordinal_of))
+        self._holiday_map = None
+
+    def has_holiday(self, day):
+        ordinal = day.toordinal()
+        index = bisect.bisect_left(self.custom_holidays, ordinal, key=_ordinal_of)
+        return index < len(self.custom_holidays) and self.custom_holidays[index].ordinal == ordinal
+
+    def add_holiday(self, day, name):
+        """Añadir un festivo personalizado; devuelve False si la fecha ya lo era"""
+        if self.has_holiday(day):
+            return False
+        self.set_holidays(self.custom_holidays + (CustomHoliday(day.toordinal(), name),))
+        return True
+
+    def holidays_in(self, year):
+        """Festivos personalizados de un año, en orden"""
+        first = bisect.bisect_left(self.custom_holidays, date(year, 1, 1).toordinal(), key=_ordinal_of)
+        last = bisect.bisect_left(self.custom_holidays, date(year + 1, 1, 1).toordinal(), key=_ordinal_of)
+        return list(self.custom_holidays[first:last])
+
+    def holiday_map(self):
+        """Festivos personalizados (fecha → nombre) para ``HolidayCalendar``"""
+        if self._holiday_map is None:
+            self._holiday_map = {holiday.date: holiday.name for holiday in self.custom_holidays}
+        return MappingProxyType(self._holiday_map)
@@ -0,0 +1,31 @@
+"""Eventos del calendario (festivos y vacaciones) en el formato de FullCalendar"""
+from .holiday_calendar import HolidayCalendar
+
+
+def holiday_event(fecha, nombre):
+    return {
+        "title": f"🎉 {nombre}",
+        "start": fecha.isoformat(),
+        "allDay": True,
+        "color": "#FF6B6B",
+        "textColor": "white"
+    }
+
+
+def vacation_event(fecha):
+    return {
+        "title": "🏖️ Vacaciones",
+        "start": fecha.isoformat(),
+        "allDay": True,
+        "color": "#4ECDC4",
+        "textColor": "white"
+    }
+
+
+def create_calendar_events(document, selected_year):
+    """Crear eventos para calendario a partir de un ``VacationDocument``"""
+    festivos_madrid = HolidayCalendar(selected_year, document.holiday_map())
+
+    eventos = [holiday_event(fecha, nombre) for fecha, nombre in festivos_madrid.items()]
+    eventos.extend(vacation_event(fecha) for fecha in document.used_days.days(selected_year))
+    return eventos
@@ -0,0 +1,97 @@
+"""Festivos oficiales cacheados por proceso y festivos personalizados de cada usuario.
+
+Los festivos oficiales de cada (año, comunidad) se calculan una sola vez y
+se comparten entre todas las sesiones. Los personalizados se normalizan y
+parsean una vez por contenido y se superponen a los oficiales con un
+ChainMap, sin copiar la tabla base.
+"""
+import functools
+from collections import ChainMap
+from collections.abc import Mapping
+from datetime import date, datetime
+from types import MappingProxyType
+
+DEFAULT_SUBDIV = "MD"
+CUSTOM_HOLIDAY_NAME = "Festivo personalizado"
+
+
+@functools.lru_cache(maxsize=64)
+def official_holidays(year, subdiv=DEFAULT_SUBDIV):
+    """Festivos oficiales de un año (fecha → nombre), de solo lectura"""
+    import holidays
+
+    return MappingProxyType(dict(holidays.Spain(years=year, subdiv=subdiv)))
+
+
+def normalize_custom_holiday(holiday):
+    """Convertir un festivo personalizado (dict o cadena antigua) en ``(fecha ISO, nombre)``"""
+    if isinstance(holiday, dict):
+        return holiday['date'], holiday.get('name', CUSTOM_HOLIDAY_NAME)
+    # Compatibilidad con formato antiguo (solo string)
+    return holiday, CUSTOM_HOLIDAY_NAME
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_custom(items):
+    parsed = {}
+    for date_str, name in items:
+        try:
+            parsed[datetime.strptime(date_str, '%Y-%m-%d').date()] = name
+        except (TypeError, ValueError):
+            pass
+    return MappingProxyType(parsed)
+
+
+def custom_holidays(custom_days):
+    """Festivos personalizados (fecha → nombre), parseados una vez por contenido.
+
+    Acepta la lista ``custom_holidays`` del JSON o un mapa fecha → nombre ya
+    decodificado (``VacationDocument.holiday_map``), que se usa tal cual.
+    """
+    if isinstance(custom_days, Mapping):
+        return custom_days
+    items = []
+    for holiday in custom_days or ():
+        try:
+            items.append(normalize_custom_holiday(holiday))
+        except KeyError:
+            pass
+    return _parse_custom(tuple(items))
+
+
+class HolidayCalendar(Mapping):
+    """Festivos de uno o varios años: oficiales más los personalizados del usuario.
+
+    Acepta como clave ``date``, ``datetime`` o ``pd.Timestamp``.
+    """
+
+    def __init__(self, years, custom_days=(), subdiv=DEFAULT_SUBDIV):
+        if isinstance(years, int):
+            years = (years,)
+        self.years = frozenset(years)
+        self._custom = custom_holidays(custom_days)
+        self._layers = ChainMap(self._custom, *(official_holidays(year, subdiv) for year in sorted(self.years)))
+        self._dates = None
+
+    def __getitem__(self, day):
+        if isinstance(day, datetime):
+            day = day.date()
+        if not isinstance(day, date) or day.year not in self.years:
+            raise KeyError(day)
+        return self._layers[day]
+
+    def __contains__(self, day):
+        if isinstance(day, datetime):
+            day = day.date()
+        return isinstance(day, date) and day.year in self.years and day in self._layers
+
+    def _sorted_dates(self):
+        if self._dates is None:
+            self._dates = tuple(sorted(day for day in self._layers if day.year in self.years))
+        return self._dates
+
+    def __iter__(self):
+        return iter(self._sorted_dates())
+
+    def __len__(self):
+        return len(self._sorted_dates())
@@ -0,0 +1,226 @@
+"""Calendario iCalendar de cada usuario con sus vacaciones y festivos.
+
+El feed se genera a partir de los mismos eventos que muestra el calendario de
+la aplicación y se guarda ya serializado junto con su ETag. Solo se vuelve a
+generar cuando cambia el hash del documento del usuario (o el conjunto de
+años que cubre, según ``VacationDocument.version``); una consulta de un
+suscriptor cuesta una comparación de hashes.
+
+Para servir los feeds a clientes de calendario::
+
+    ICS_FEED_SECRET=... python -m vacaciones.ics_feed --port 8502
+
+Cada usuario tiene una URL ``/<usuario>.ics?token=<token>``, con un token
+derivado de ``ICS_FEED_SECRET`` (``feed_token``).
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import quote
+
+from .document import VacationDocument
+from .events import create_calendar_events
+from .storage import content_version, get_storage
+
+PRODID = "-//schedule-manager//vacaciones//ES"
+MAX_LINE_OCTETS = 75
+
+CATEGORIES = {"🎉": "FESTIVO", "🏖️": "VACACIONES"}
+
+
+class Feed:
+    """Feed serializado de un usuario y el documento del que se generó"""
+
+    __slots__ = ("version", "etag", "body", "document")
+
+    def __init__(self, version, etag, body, document):
+        self.version = version
+        self.etag = etag
+        self.body = body
+        self.document = document
+
+
+def feed_years(document, today=None):
+    """Años del feed: los que tienen vacaciones más el actual y el siguiente"""
+    today = today or date.today()
+    return tuple(sorted({today.year, today.year + 1, *document.used_days.years()}))
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    """Partir una línea en trozos de 75 octetos como exige RFC 5545"""
+    encoded = line.encode()
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line
+    parts = []
+    limit = MAX_LINE_OCTETS
+    while encoded:
+        cut = min(limit, len(encoded))
+        # No partir un carácter UTF-8 por la mitad
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = MAX_LINE_OCTETS - 1
+    return "\r\n ".join(parts)
+
+
+def build_feed(document, years, calendar_name="Vacaciones", uid_domain="schedule-manager"):
+    """Serializar las vacaciones y festivos de ``years`` como iCalendar"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(calendar_name)}",
+    ]
+    for year in years:
+        for event in create_calendar_events(document, year):
+            start = date.fromisoformat(event["start"])
+            category = next((name for icon, name in CATEGORIES.items() if event["title"].startswith(icon)), "")
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:{start:%Y%m%d}-{category.lower()}@{uid_domain}",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+                f"DTEND;VALUE=DATE:{start + timedelta(days=1):%Y%m%d}",
+                f"SUMMARY:{_escape(event['title'])}",
+                f"CATEGORIES:{category}",
+                "TRANSP:TRANSPARENT",
+                "END:VEVENT",
+            ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode()
+
+
+class FeedCache:
+    """Feeds serializados por usuario, regenerados solo si cambia el documento"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, document, today=None):
+        """Feed de ``username`` para la versión actual de ``document``"""
+        years = feed_years(document, today)
+        version = f"{document.version}-{'-'.join(map(str, years))}"
+        with self._lock:
+            feed = self._feeds.get(username)
+            if feed is not None and feed.version == version:
+                self._feeds.move_to_end(username)
+                return feed
+
+        name = document.full_name or username
+        body = build_feed(document, years, f"Vacaciones de {name}", f"{username}.schedule-manager")
+        feed = Feed(version, f'"{hashlib.sha1(body).hexdigest()}"', body, document)
+        with self._lock:
+            self._feeds[username] = feed
+            self._feeds.move_to_end(username)
+            while len(self._feeds) > self.maxsize:
+                self._feeds.popitem(last=False)
+        return feed
+
+    def document(self, username, vacation_data):
+        """``VacationDocument`` de ``vacation_data``; sin decodificarlo si el feed guardado es de esa versión"""
+        version = content_version(vacation_data)
+        with self._lock:
+            feed = self._feeds.get(username)
+        if feed is not None and feed.document.version == version:
+            return feed.document
+        return VacationDocument.from_dict(vacation_data, version)
+
+
+def feed_token(secret, username):
+    """Token de la URL de suscripción de ``username``"""
+    return hmac.new(secret.encode(), username.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def feed_url(base_url, secret, username):
+    """URL de suscripción al feed de ``username``"""
+    return f"{base_url.rstrip('/')}/{quote(username)}.ics?token={feed_token(secret, username)}"
+
+
+def make_handler(backend, cache, secret):
+    """Manejador HTTP que sirve ``/<usuario>.ics`` con ETag y 304"""
+    from http import HTTPStatus
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, unquote, urlsplit
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            username = unquote(url.path.strip("/").removesuffix(".ics"))
+            token = parse_qs(url.query).get("token", [""])[0]
+            if not url.path.endswith(".ics") or not hmac.compare_digest(token, feed_token(secret, username)):
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            vacation_data = backend.load(f"vacation_data_{username}.json")
+            if vacation_data is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            feed = cache.get(username, cache.document(username, vacation_data))
+            if self.headers.get("If-None-Match") == feed.etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", feed.etag)
+                self.end_headers()
+                return
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/calendar; charset=utf-8")
+            self.send_header("Content-Length", str(len(feed.body)))
+            self.send_header("ETag", feed.etag)
+            self.end_headers()
+            self.wfile.write(feed.body)
+
+    return FeedHandler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m vacaciones.ics_feed",
+        description="Sirve el calendario iCalendar de cada usuario"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--backend", choices=["local", "sqlite", "github"], help="Backend de almacenamiento")
+    parser.add_argument("--path", help="Directorio (local) o base de datos (sqlite)")
+    return parser
+
+
+def main(argv=None):
+    from http.server import ThreadingHTTPServer
+
+    args = build_parser().parse_args(argv)
+    config = {}
+    if args.backend:
+        config["STORAGE_BACKEND"] = args.backend
+    if args.path:
+        config["STORAGE_PATH"] = args.path
+    secret = os.environ.get("ICS_FEED_SECRET", "")
+    if not secret:
+        print("Falta ICS_FEED_SECRET", file=sys.stderr)
+        return 1
+
+    handler = make_handler(get_storage(config), FeedCache(), secret)
+    with ThreadingHTTPServer((args.host, args.port), handler) as server:
+        print(f"Sirviendo feeds en http://{args.host}:{args.port}/<usuario>.ics")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Importación de historiales de vacaciones desde JSON, CSV o iCalendar.
+
+Los lectores recorren el fichero y producen filas ``ImportRow`` sin cargar
+todas las líneas en memoria (el JSON de exportación de la aplicación se
+decodifica como un único documento). Las fechas se validan en una sola pasada
+vectorizada con pandas; los rangos se expanden a días laborables y los
+registros se deduplican por fecha. Las filas rechazadas se devuelven con el
+motivo para mostrarlas al usuario.
+
+Formatos admitidos:
+
+* JSON exportado por la aplicación (``used_days`` y ``custom_holidays``,
+  incluidos festivos antiguos guardados como cadena).
+* CSV con cabecera, separado por comas o punto y coma, con una columna de
+  fecha (``fecha``/``date``/``inicio``/``start``) y opcionalmente ``fin``,
+  ``tipo`` (vacaciones o festivo) y ``nombre``. Fechas ``AAAA-MM-DD`` o
+  ``DD/MM/AAAA``.
+* iCalendar (``.ics``): cada ``VEVENT`` es un rango de vacaciones, o de
+  festivos si su resumen o categoría lo indica.
+"""
+import contextlib
+import csv
+import io
+import json
+from datetime import date
+
+from .holiday_calendar import CUSTOM_HOLIDAY_NAME, HolidayCalendar, custom_holidays, normalize_custom_holiday
+
+VACATION = "vacation"
+HOLIDAY = "holiday"
+
+FORMATS = ("json", "csv", "ics")
+
+# Un rango no puede abarcar más de un año
+MAX_SPAN_DAYS = 366
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d")
+
+CSV_COLUMNS = {
+    "start": ("fecha", "date", "inicio", "start", "desde", "from"),
+    "end": ("fin", "end", "hasta", "to"),
+    "kind": ("tipo", "type", "kind"),
+    "name": ("nombre", "name", "descripcion", "descripción", "description", "motivo"),
+}
+
+HOLIDAY_MARKERS = ("festivo", "holiday", "fiesta")
+
+
+class ImportRow:
+    """Fila leída de un fichero de importación, antes de validar las fechas"""
+
+    __slots__ = ("kind", "start", "end", "name", "source", "end_exclusive")
+
+    def __init__(self, kind, start, end=None, name=None, source="", end_exclusive=False):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.name = name
+        # Posición en el fichero, para informar de las filas rechazadas
+        self.source = source
+        # En iCalendar el final de un evento de día completo no se incluye
+        self.end_exclusive = end_exclusive
+
+
+class ImportResult:
+    """Días y festivos válidos de una importación y filas rechazadas"""
+
+    __slots__ = ("used_days", "custom_holidays", "rejected", "rows")
+
+    def __init__(self, used_days, custom_holidays, rejected, rows):
+        # Cadenas ISO ordenadas, sin duplicados
+        self.used_days = used_days
+        # [{"date": ISO, "name": nombre}] ordenados por fecha, uno por fecha
+        self.custom_holidays = custom_holidays
+        # [(origen, valor, motivo)]
+        self.rejected = rejected
+        self.rows = rows
+
+
+class ImportFormatError(ValueError):
+    """El fichero no se puede leer en el formato indicado"""
+
+
+def detect_format(file_name):
+    """Formato a partir de la extensión del fichero"""
+    extension = file_name.rsplit(".", 1)[-1].lower()
+    if extension in ("ical", "ifb", "icalendar"):
+        extension = "ics"
+    if extension not in FORMATS:
+        raise ImportFormatError(f"Formato no admitido: .{extension}")
+    return extension
+
+
+@contextlib.contextmanager
+def _text(stream):
+    """Vista de texto del fichero, decodificada a medida que se lee.
+
+    Al terminar se separa del fichero binario sin cerrarlo.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        yield text
+    finally:
+        text.detach()
+
+
+def _kind(value):
+    value = (value or "").lower()
+    return HOLIDAY if any(marker in value for marker in HOLIDAY_MARKERS) else VACATION
+
+
+def read_json(stream):
+    """Filas de un ``vacation_data.json`` exportado por la aplicación"""
+    try:
+        with _text(stream) as text:
+            data = json.load(text)
+    except ValueError as e:
+        raise ImportFormatError(f"JSON no válido: {e}")
+    if not isinstance(data, dict):
+        raise ImportFormatError("El JSON debe ser un objeto con 'used_days' y 'custom_holidays'")
+
+    for index, day in enumerate(data.get("used_days") or []):
+        yield ImportRow(VACATION, day, source=f"used_days[{index}]")
+    for index, holiday in enumerate(data.get("custom_holidays") or []):
+        try:
+            day, name = normalize_custom_holiday(holiday)
+        except (KeyError, TypeError):
+            day, name = None, None
+        yield ImportRow(HOLIDAY, day, name=name, source=f"custom_holidays[{index}]")
+
+
+def _column(fieldnames, aliases):
+    for field in fieldnames:
+        if field and field.strip().lower() in aliases:
+            return field
+    return None
+
+
+def read_csv(stream):
+    """Filas de un CSV con cabecera"""
+    with _text(stream) as text:
+        header = text.readline()
+        delimiter = ";" if header.count(";") > header.count(",") else ","
+        fieldnames = next(csv.reader([header], delimiter=delimiter), [])
+        columns = {key: _column(fieldnames, aliases) for key, aliases in CSV_COLUMNS.items()}
+        if columns["start"] is None:
+            raise ImportFormatError("El CSV necesita una columna 'fecha', 'date', 'inicio' o 'start'")
+        start_col, end_col, kind_col, name_col = (
+            fieldnames.index(columns[key]) if columns[key] is not None else None
+            for key in ("start", "end", "kind", "name")
+        )
+
+        def cell(record, index):
+            return record[index].strip() if index is not None and index < len(record) else ""
+
+        for line_number, record in enumerate(csv.reader(text, delimiter=delimiter), start=2):
+            if not any(record):
+                continue
+            end = cell(record, end_col)
+            name = cell(record, name_col)
+            yield ImportRow(
+                _kind(cell(record, kind_col)), cell(record, start_col), end or None, name or None, f"línea {line_number}"
+            )
+
+
+def _unfolded(lines):
+    """Líneas lógicas de iCalendar: las que empiezan por espacio continúan la anterior"""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _unescape(value):
+    return value.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def read_ics(stream):
+    """Filas de los ``VEVENT`` de un fichero iCalendar"""
+    event = None
+    with _text(stream) as text:
+        for line_number, line in enumerate(_unfolded(text), start=1):
+            name, _, value = line.partition(":")
+            prop, _, params = name.partition(";")
+            prop = prop.upper()
+            if prop == "BEGIN" and value.upper() == "VEVENT":
+                event = {"line": line_number}
+            elif prop == "END" and value.upper() == "VEVENT" and event is not None:
+                summary = event.get("SUMMARY", "")
+                kind = _kind(f"{summary} {event.get('CATEGORIES', '')}")
+                # Los eventos de día completo terminan el día anterior a DTEND
+                all_day = "VALUE=DATE" in event.get("DTEND_PARAMS", "").upper() or len(event.get("DTEND", "")) == 8
+                yield ImportRow(
+                    kind,
+                    event.get("DTSTART", "")[:8],
+                    event.get("DTEND", "")[:8] or None,
+                    summary or None,
+                    f"evento en la línea {event['line']}",
+                    end_exclusive=all_day
+                )
+                event = None
+            elif event is not None and prop in ("DTSTART", "DTEND", "SUMMARY", "CATEGORIES"):
+                event[prop] = _unescape(value.strip())
+                event[f"{prop}_PARAMS"] = params
+        if event is not None:
+            raise ImportFormatError("Fichero iCalendar incompleto: falta END:VEVENT")
+
+
+READERS = {"json": read_json, "csv": read_csv, "ics": read_ics}
+
+
+def _parse_dates(values):
+    """Fechas de ``values`` como Series de pandas; ``NaT`` donde no son válidas"""
+    import pandas as pd
+
+    raw = pd.Series(values, dtype="object").where(lambda s: s.map(lambda v: isinstance(v, str)))
+    raw = raw.str.strip()
+    parsed = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+    for date_format in DATE_FORMATS:
+        missing = parsed.isna() & raw.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(raw[missing], format=date_format, errors="coerce")
+    return parsed
+
+
+def validate(rows, custom_days=()):
+    """Validar y normalizar las filas de una importación.
+
+    Las fechas de todas las filas se analizan a la vez. Un rango de vacaciones
+    se expande a sus días laborables, sin los festivos oficiales ni los
+    personalizados (``custom_days``, la lista del JSON o un mapa fecha →
+    nombre, más los importados); un rango de festivos, a todos sus días.
+    """
+    import numpy as np
+
+    from .business_days import BusinessCalendar, to_iso
+
+    rows = list(rows)
+    rejected = []
+    if not rows:
+        return ImportResult([], [], rejected, 0)
+
+    starts = _parse_dates([row.start for row in rows])
+    ends = _parse_dates([row.end for row in rows])
+    has_end = np.array([row.end is not None for row in rows])
+    exclusive = np.array([row.end_exclusive for row in rows])
+
+    starts = starts.to_numpy().astype("datetime64[D]")
+    ends = ends.to_numpy().astype("datetime64[D]")
+    ends = np.where(has_end, ends - exclusive.astype("timedelta64[D]"), starts)
+    # Un evento de día completo de un solo día tiene DTEND = DTSTART + 1
+    ends = np.where(has_end & (ends < starts) & exclusive, starts, ends)
+
+    bad_start = np.isnat(starts)
+    bad_end = ~bad_start & has_end & np.isnat(ends)
+    span = (ends - starts).astype("timedelta64[D]").astype(np.int64)
+    reversed_range = ~bad_start & ~bad_end & (span < 0)
+    too_long = ~bad_start & ~bad_end & (span > MAX_SPAN_DAYS)
+    valid = ~(bad_start | bad_end | reversed_range | too_long)
+
+    reasons = (
+        (bad_start, "fecha no válida"),
+        (bad_end, "fecha de fin no válida"),
+        (reversed_range, "el fin es anterior al inicio"),
+        (too_long, f"el rango supera {MAX_SPAN_DAYS} días"),
+    )
+    for mask, reason in reasons:
+        for index in np.flatnonzero(mask):
+            rejected.append((int(index), reason))
+    rejected = [
+        (rows[index].source, rows[index].start if rows[index].end is None else f"{rows[index].start} – {rows[index].end}", reason)
+        for index, reason in sorted(rejected)
+    ]
+
+    # Festivos: una entrada por fecha, gana el primer nombre leído
+    holidays = {}
+    holiday_rows = np.flatnonzero(valid & np.array([row.kind == HOLIDAY for row in rows]))
+    for index in holiday_rows:
+        name = rows[index].name or CUSTOM_HOLIDAY_NAME
+        for day in to_iso(np.arange(starts[index], ends[index] + 1, dtype="datetime64[D]")):
+            holidays.setdefault(day, name)
+
+    vacation_mask = valid & np.array([row.kind == VACATION for row in rows])
+    single = vacation_mask & (span == 0)
+    used = set(to_iso(starts[single]))
+
+    ranges = np.flatnonzero(vacation_mask & (span > 0))
+    if len(ranges):
+        years = range(int(str(starts[ranges].min())[:4]), int(str(ends[ranges].max())[:4]) + 1)
+        custom = dict(custom_holidays(custom_days))
+        for day, name in holidays.items():
+            custom.setdefault(date.fromisoformat(day), name)
+        calendar = BusinessCalendar(HolidayCalendar(years, custom))
+        for index in ranges:
+            used.update(to_iso(calendar.days(starts[index], ends[index])))
+
+    return ImportResult(
+        sorted(used),
+        [{"date": day, "name": name} for day, name in sorted(holidays.items())],
+        rejected,
+        len(rows)
+    )
+
+
+def import_file(stream, file_name, custom_days=()):
+    """Leer y validar un fichero de importación"""
+    return validate(READERS[detect_format(file_name)](stream), custom_days)
+
+
+def merge_import(document, result, replace=False):
+    """``VacationDocument`` con la importación aplicada.
+
+    Con ``replace`` los días y festivos importados sustituyen a los actuales;
+    si no, se combinan sin duplicar fechas y se conserva el nombre de los
+    festivos que ya existían. Devuelve un documento nuevo para guardarlo con
+    una sola escritura.
+    """
+    from .day_set import DaySet
+    from .document import CustomHoliday
+
+    merged = document.copy()
+    imported = [CustomHoliday(date.fromisoformat(holiday['date']).toordinal(), holiday['name']) for holiday in result.custom_holidays]
+    if replace:
+        merged.used_days = DaySet.from_iso(result.used_days)
+        merged.set_holidays(imported)
+        merged.invalid_holidays = ()
+        return merged
+
+    merged.used_days = document.used_days | DaySet.from_iso(result.used_days)
+    holidays = {holiday.ordinal: holiday for holiday in document.custom_holidays}
+    for holiday in imported:
+        holidays.setdefault(holiday.ordinal, holiday)
+    merged.set_holidays(holidays.values())
+    return merged
+
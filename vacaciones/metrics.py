@@ -0,0 +1,254 @@
+"""Medición de tiempos de las rutas críticas.
+
+``timed(nombre)`` mide un bloque y anota la duración en tres sitios:
+
+* el desglose de la ejecución actual del script (``start_rerun`` /
+  ``finish_rerun``), que guarda cada hilo por separado;
+* un histograma por nombre compartido por todo el proceso, que
+  ``write_prometheus`` vuelca en formato de texto de Prometheus junto con las
+  cabeceras ``X-RateLimit-*`` de la última respuesta de GitHub;
+* una línea JSON en el logger ``vacaciones.metrics`` (nivel DEBUG por bloque,
+  INFO por ejecución).
+
+``instrument_storage`` envuelve un backend para medir cada operación y
+registra un hook en las sesiones HTTP de GitHub.
+"""
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .changelog import ChangeLogStorage
+from .storage import GitHubStorage, MirroredStorage, StorageBackend
+
+logger = logging.getLogger("vacaciones.metrics")
+
+# Límites superiores de los intervalos de los histogramas, en segundos
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RATE_LIMIT_HEADERS = {
+    "X-RateLimit-Limit": "vacaciones_github_rate_limit_limit",
+    "X-RateLimit-Remaining": "vacaciones_github_rate_limit_remaining",
+    "X-RateLimit-Used": "vacaciones_github_rate_limit_used",
+    "X-RateLimit-Reset": "vacaciones_github_rate_limit_reset_timestamp_seconds",
+}
+
+# Texto de "# HELP" de los contadores y valores instantáneos
+HELP = {
+    "vacaciones_github_responses_total": "Respuestas de la API de GitHub por código de estado",
+    "vacaciones_github_rate_limit_limit": "Peticiones por hora permitidas por GitHub (X-RateLimit-Limit)",
+    "vacaciones_github_rate_limit_remaining": "Peticiones que quedan en la ventana actual (X-RateLimit-Remaining)",
+    "vacaciones_github_rate_limit_used": "Peticiones hechas en la ventana actual (X-RateLimit-Used)",
+    "vacaciones_github_rate_limit_reset_timestamp_seconds": "Momento en que se reinicia la ventana, en segundos Unix (X-RateLimit-Reset)",
+}
+
+# [(nombre, segundos)] de la ejecución en curso del hilo actual
+_current = contextvars.ContextVar("vacaciones_rerun_timings", default=None)
+
+
+class Histogram:
+    """Histograma acumulado con los intervalos de ``BUCKETS``"""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Registry:
+    """Histogramas y valores instantáneos del proceso"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def increment(self, name, labels=()):
+        with self._lock:
+            key = (name, tuple(labels))
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            if self.histograms:
+                lines += [
+                    "# HELP vacaciones_duration_seconds Duración de las operaciones medidas",
+                    "# TYPE vacaciones_duration_seconds histogram",
+                ]
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f'vacaciones_duration_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'vacaciones_duration_seconds_sum{{op="{name}"}} {histogram.total:.6f}')
+                lines.append(f'vacaciones_duration_seconds_count{{op="{name}"}} {histogram.count}')
+            previous = None
+            for (name, labels), value in sorted(self.counters.items()):
+                # HELP y TYPE una sola vez por métrica, antes de todas sus series
+                if name != previous:
+                    lines += _header(name, "counter")
+                    previous = name
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{name}{{{label_text}}} {value}")
+            for name, value in sorted(self.gauges.items()):
+                lines += _header(name, "gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name, kind):
+    lines = [f"# HELP {name} {HELP[name]}"] if name in HELP else []
+    return lines + [f"# TYPE {name} {kind}"]
+
+
+REGISTRY = Registry()
+
+
+def record(name, seconds):
+    """Anotar una duración medida fuera de ``timed``"""
+    REGISTRY.observe(name, seconds)
+    spans = _current.get()
+    if spans is not None:
+        spans.append((name, seconds))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"event": "timing", "op": name, "ms": round(seconds * 1000, 3)}))
+
+
+@contextlib.contextmanager
+def timed(name):
+    """Medir la duración del bloque"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def start_rerun():
+    """Empezar el desglose de una ejecución del script en este hilo"""
+    _current.set([])
+
+
+def finish_rerun(**fields):
+    """Terminar el desglose: devuelve ``[(nombre, llamadas, segundos)]`` y lo registra en el log"""
+    spans = _current.get() or []
+    _current.set(None)
+    breakdown = {}
+    for name, seconds in spans:
+        calls, total = breakdown.get(name, (0, 0.0))
+        breakdown[name] = (calls + 1, total + seconds)
+    rows = [(name, calls, total) for name, (calls, total) in breakdown.items()]
+    logger.info(json.dumps({
+        "event": "rerun",
+        **fields,
+        "ops": {name: {"calls": calls, "ms": round(total * 1000, 3)} for name, calls, total in rows},
+    }, ensure_ascii=False))
+    return rows
+
+
+def observe_github_response(response, *args, **kwargs):
+    """Hook de ``requests``: duración, código de estado y límite de peticiones de GitHub"""
+    REGISTRY.observe(f"github.{response.request.method}", response.elapsed.total_seconds())
+    REGISTRY.increment("vacaciones_github_responses_total", (("status", str(response.status_code)),))
+    for header, metric in RATE_LIMIT_HEADERS.items():
+        value = response.headers.get(header)
+        if value is not None and value.isdigit():
+            REGISTRY.set_gauge(metric, int(value))
+    return response
+
+
+class InstrumentedStorage(StorageBackend):
+    """Backend que mide la duración de cada operación del backend envuelto"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def load(self, name):
+        with timed("storage.load"):
+            return self.backend.load(name)
+
+    def save(self, name, data, message):
+        with timed("storage.save"):
+            return self.backend.save(name, data, message)
+
+    def load_versioned(self, name):
+        with timed("storage.load_versioned"):
+            return self.backend.load_versioned(name)
+
+    def compare_and_swap(self, name, data, message, expected):
+        with timed("storage.compare_and_swap"):
+            return self.backend.compare_and_swap(name, data, message, expected)
+
+
+def instrument_storage(backend):
+    """Envolver ``backend`` para medirlo y observar las respuestas de GitHub"""
+    pending = [backend]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, ChangeLogStorage):
+            pending.append(current.backend)
+        elif isinstance(current, MirroredStorage):
+            pending += [current.primary, current.mirror]
+        elif isinstance(current, GitHubStorage):
+            hooks = current.client.session.hooks["response"]
+            if observe_github_response not in hooks:
+                hooks.append(observe_github_response)
+    return InstrumentedStorage(backend)
+
+
+def write_prometheus(path, registry=REGISTRY):
+    """Escribir las métricas en ``path`` de forma atómica (para el textfile collector)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(registry.render())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class PeriodicWriter:
+    """Escribe el fichero de métricas como mucho una vez cada ``interval`` segundos"""
+
+    def __init__(self, path, interval=15):
+        self.path = path
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def maybe_write(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last < self.interval:
+                return False
+            self._last = now
+        write_prometheus(self.path)
+        return True
@@ -0,0 +1,243 @@
+"""Informe mensual de registro de jornada sobre la plantilla ``horas_registro.pdf``.
+
+La disposición de los campos de la plantilla se analiza una sola vez por
+proceso: campos de cabecera y una rejilla de filas de días. Cada informe se
+genera en memoria a partir de los bytes de la plantilla y se devuelve como
+bytes, sin ficheros temporales.
+
+PyMuPDF, numpy y babel se importan al generar el primer informe, no al
+importar el módulo.
+"""
+import functools
+import io
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+TEMPLATE_FILE = 'horas_registro.pdf'
+
+# Subcadena del nombre del campo de cabecera → dato que lo rellena
+HEADER_KEYS = {
+    "MES": "month",
+    "AÑO": "year",
+    "ANIO": "year",
+    "CENTRO": "workplace",
+    "NIF": "nif",
+    "NOMBRE": "full_name",
+    "EMPRESA": "company",
+}
+
+# Celdas de cada fila de la rejilla: día, cuatro horas de entrada/salida,
+# un tercer tramo sin usar, total de horas e incidencia
+ROW_SIZE = 9
+DAY, IN_1, OUT_1, IN_2, OUT_2 = 0, 1, 2, 3, 4
+TOTAL, INCIDENCE = 7, 8
+WORKDAY_HOURS = {IN_1: "9:00", OUT_1: "13:00", IN_2: "14:00", OUT_2: "17:30", TOTAL: "7,5"}
+
+# Campos de cabecera al principio de la primera página
+HEADER_CELLS = 5
+
+
+class TemplateLayout:
+    """Bytes de la plantilla y xrefs de sus campos de cabecera y de la rejilla de días"""
+
+    __slots__ = ("pdf_bytes", "header", "rows")
+
+    def __init__(self, pdf_bytes, header, rows):
+        self.pdf_bytes = pdf_bytes
+        # dato → [(página, xref)]
+        self.header = header
+        # [(página, (xref_celda_0, ..., xref_celda_8))] en orden de rellenado
+        self.rows = rows
+
+
+def compile_layout(pdf_bytes):
+    """Analizar los campos de la plantilla"""
+    import fitz  # PyMuPDF
+
+    header = {}
+    rows = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page_index in range(len(doc)):
+            fields = list(doc[page_index].widgets())
+
+            if page_index == 0:
+                for f in fields:
+                    if not f.field_name:
+                        continue
+                    fname = f.field_name.upper()
+                    for key, slot in HEADER_KEYS.items():
+                        if key in fname:
+                            header.setdefault(slot, []).append((page_index, f.xref))
+
+            start = HEADER_CELLS if page_index == 0 else 0
+            for cell_index in range(start, len(fields), ROW_SIZE):
+                rows.append((page_index, tuple(f.xref for f in fields[cell_index:cell_index + ROW_SIZE])))
+    return TemplateLayout(pdf_bytes, header, rows)
+
+
+@functools.lru_cache(maxsize=4)
+def load_template(path=TEMPLATE_FILE):
+    """Plantilla leída y analizada una sola vez por proceso"""
+    return compile_layout(Path(path).read_bytes())
+
+
+def report_days(year, month, used_days, holidays):
+    """Días de lunes a viernes del mes como ``(día, es_festivo, es_vacaciones)``; ``used_days`` es un ``DaySet``"""
+    import numpy as np
+
+    from .business_days import BusinessCalendar, month_bounds, to_datetime64
+
+    first_day, last_day = month_bounds(year, month)
+    # Todos los días de lunes a viernes; los festivos se marcan en el informe
+    weekdays = BusinessCalendar().days(first_day, last_day)
+    holiday_flags = np.isin(weekdays, to_datetime64(holidays))
+    days = weekdays.tolist()
+    return [(day, is_holiday, day in used_days) for day, is_holiday in zip(days, holiday_flags.tolist())]
+
+
+def month_name(selected_month):
+    """Nombre del mes en mayúsculas, como aparece en el informe"""
+    from babel.dates import format_date
+
+    return format_date(selected_month, "LLLL", locale="es").upper()
+
+
+def report_file_name(selected_month):
+    return f'{month_name(selected_month)}_registro.pdf'
+
+
+def _to_bytes(doc):
+    """Serializar el documento en un buffer nativo de MuPDF.
+
+    ``Document.tobytes`` escribe a través de Python en bloques de pocos bytes
+    y tarda unas diez veces más que la escritura directa en el buffer.
+    """
+    try:
+        from pymupdf import mupdf
+    except ImportError:
+        return doc.tobytes()
+    buffer = mupdf.FzBuffer(len(doc) * 64 * 1024)
+    output = mupdf.FzOutput(buffer)
+    mupdf.pdf_write_document(mupdf.pdf_document_from_fz_document(doc.this), output, mupdf.PdfWriteOptions())
+    output.fz_close_output()
+    return buffer.fz_buffer_extract()
+
+
+def _set(page, xref, value):
+    widget = page.load_widget(xref)
+    widget.field_value = value
+    widget.update()
+
+
+def render_report(selected_month, document, holidays, layout=None):
+    """Rellenar el informe del mes de un ``VacationDocument`` y devolverlo como bytes"""
+    import fitz  # PyMuPDF
+
+    layout = layout or load_template()
+    values = {
+        "month": month_name(selected_month),
+        "year": str(selected_month.year),
+        "workplace": document.workplace,
+        "nif": document.nif,
+        "full_name": document.full_name,
+        "company": document.company,
+    }
+
+    with fitz.open(stream=layout.pdf_bytes, filetype="pdf") as doc:
+        pages = {}
+
+        def page(index):
+            if index not in pages:
+                pages[index] = doc[index]
+            return pages[index]
+
+        for slot, targets in layout.header.items():
+            for page_index, xref in targets:
+                _set(page(page_index), xref, values[slot])
+
+        days = report_days(selected_month.year, selected_month.month, document.used_days, holidays)
+        for (page_index, cells), (day, is_festivo, is_vacation) in zip(layout.rows, days):
+            target = page(page_index)
+            _set(target, cells[DAY], str(day.day))
+            if is_festivo or is_vacation:
+                if len(cells) > INCIDENCE:
+                    _set(target, cells[INCIDENCE], "FESTIVO" if is_festivo else "VACACIONES")
+            else:
+                for cell, value in WORKDAY_HOURS.items():
+                    if cell < len(cells):
+                        _set(target, cells[cell], value)
+
+        return _to_bytes(doc)
+
+
+def month_range(start, end):
+    """Primer día de cada mes entre ``start`` y ``end`` (ambos incluidos)"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(start.replace(year=year, month=month, day=1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _render_month(selected_month, document, holidays, template):
+    # Cada proceso del pool analiza la plantilla una vez gracias a load_template
+    return render_report(selected_month, document, holidays, load_template(template))
+
+
+def report_pool(max_workers=None):
+    """Pool de procesos para la exportación por lotes.
+
+    Usa ``spawn``: el servidor de Streamlit tiene hilos en marcha y ``fork``
+    podría copiar bloqueos tomados a los procesos hijos.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def render_months(months, document, holidays, executor=None, progress=None, template=TEMPLATE_FILE):
+    """Generar los informes de varios meses en paralelo.
+
+    Devuelve ``[(mes, bytes)]`` en el orden de ``months``. ``holidays`` debe
+    cubrir todos los años del rango; ``progress(hechos, total, mes)`` se
+    llama al terminar cada mes.
+    """
+    holidays = dict(holidays)
+    own_executor = executor is None
+    executor = executor or report_pool()
+    try:
+        futures = {
+            executor.submit(_render_month, month, document, holidays, template): month
+            for month in months
+        }
+        results = {}
+        for done, future in enumerate(as_completed(futures), start=1):
+            month = futures[future]
+            results[month] = future.result()
+            if progress is not None:
+                progress(done, len(futures), month)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return [(month, results[month]) for month in months]
+
+
+def merge_reports(reports):
+    """Unir los informes en un solo PDF"""
+    import fitz  # PyMuPDF
+
+    with fitz.open() as merged:
+        for _, pdf_bytes in reports:
+            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                merged.insert_pdf(doc)
+        return _to_bytes(merged)
+
+
+def zip_reports(reports):
+    """Empaquetar los informes en un ZIP con un PDF por mes"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for month, pdf_bytes in reports:
+            archive.writestr(f"{month.year}_{month.month:02d}_{report_file_name(month)}", pdf_bytes)
+    return buffer.getvalue()
@@ -0,0 +1,468 @@
+"""Backends de almacenamiento para usuarios y datos de vacaciones.
+
+Cada documento se identifica por su nombre de fichero (``users.json``,
+``vacation_data_<usuario>.json``) y se guarda como JSON. Todos los backends
+exponen la misma interfaz: ``load(name)`` y ``save(name, data, message)``.
+``get_storage`` envuelve los backends local y sqlite en ``changelog.ChangeLogStorage``.
+"""
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se excluyen los hilos de este proceso
+    fcntl = None
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+class StorageError(Exception):
+    """Error al guardar un documento"""
+
+
+class ConflictError(StorageError):
+    """El documento cambió desde la versión leída"""
+
+
+def content_version(data):
+    """Versión de un documento: hash de su JSON canónico"""
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+class StorageBackend:
+    """Interfaz común de los backends de almacenamiento"""
+
+    _cas_lock = threading.Lock()
+
+    def load(self, name):
+        """Devolver el documento ``name`` o None si no existe"""
+        raise NotImplementedError
+
+    def save(self, name, data, message):
+        """Guardar el documento ``name``; lanza StorageError si falla"""
+        raise NotImplementedError
+
+    def load_versioned(self, name):
+        """Devolver ``(documento, versión)``; la versión es None si no existe"""
+        data = self.load(name)
+        return data, (content_version(data) if data is not None else None)
+
+    def compare_and_swap(self, name, data, message, expected):
+        """Guardar solo si la versión actual es ``expected`` (None: solo si no existe).
+
+        Devuelve la nueva versión; lanza ConflictError si otro la cambió antes.
+        """
+        with self._cas_lock:
+            _, version = self.load_versioned(name)
+            if version != expected:
+                raise ConflictError(name)
+            self.save(name, data, message)
+        return content_version(data)
+
+
+class CacheEntry:
+    """Cuerpo de un documento junto con su ETag y SHA de blob"""
+
+    __slots__ = ("body", "etag", "sha", "checked_at")
+
+    def __init__(self, body, etag, sha):
+        self.body = body
+        self.etag = etag
+        self.sha = sha
+        self.checked_at = time.monotonic()
+
+
+class ReadCache:
+    """Caché LRU de lecturas indexada por ruta, con revalidación tras ``ttl`` segundos"""
+
+    def __init__(self, ttl=10, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+            return entry
+
+    def put(self, path, entry):
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path):
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def is_fresh(self, entry):
+        return time.monotonic() - entry.checked_at < self.ttl
+
+
+class GitHubClient:
+    """Cliente de la Contents API con conexiones persistentes y seguimiento de SHA.
+
+    Recuerda el SHA de blob de la última lectura o escritura de cada fichero
+    para usarlo directamente en el siguiente PUT; solo vuelve a consultarlo
+    si GitHub responde 409/422 por un SHA obsoleto o ausente.
+    """
+
+    def __init__(self, token, repo, branch="main", api_url=GITHUB_API_URL, cache=None, pool_size=16):
+        self.repo = repo
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.cache = cache if cache is not None else ReadCache()
+        # requests solo se importa si se usa el backend de GitHub
+        import requests
+        import requests.adapters
+
+        self._request_error = requests.RequestException
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._shas = {}
+        self._lock = threading.Lock()
+
+    def _url(self, path):
+        return f"{self.api_url}/repos/{self.repo}/contents/{path}"
+
+    def _request(self, method, path, **kwargs):
+        try:
+            return self.session.request(method, self._url(path), **kwargs)
+        except self._request_error as e:
+            raise StorageError(str(e)) from e
+
+    def _remember_sha(self, path, sha):
+        with self._lock:
+            if sha is None:
+                self._shas.pop(path, None)
+            else:
+                self._shas[path] = sha
+
+    def known_sha(self, path):
+        with self._lock:
+            return self._shas.get(path)
+
+    def get(self, path):
+        """Devolver el contenido de ``path`` como texto o None si no existe.
+
+        Cualquier otra respuesta (límite de peticiones, credenciales, error del
+        servidor) lanza ``StorageError``: no significa que el fichero no exista.
+        """
+        entry = self.cache.get(path)
+        if entry is not None and self.cache.is_fresh(entry):
+            return entry.body
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+        response = self._request("GET", path, headers=headers, params={"ref": self.branch})
+        if response.status_code == 304 and entry is not None:
+            # Sin cambios: GitHub no descuenta las respuestas 304 del límite de peticiones
+            entry.checked_at = time.monotonic()
+            return entry.body
+        if response.status_code == 200:
+            content = response.json()
+            body = base64.b64decode(content['content']).decode()
+            self.cache.put(path, CacheEntry(body, response.headers.get("ETag"), content["sha"]))
+            self._remember_sha(path, content["sha"])
+            return body
+
+        if response.status_code == 404:
+            self.cache.invalidate(path)
+            self._remember_sha(path, None)
+            return None
+        raise StorageError(f"GitHub {response.status_code} al leer {path}: {response.text}")
+
+    def _fetch_sha(self, path):
+        response = self._request("GET", path, params={"ref": self.branch})
+        if response.status_code not in (200, 404):
+            raise StorageError(f"GitHub {response.status_code} al leer {path}: {response.text}")
+        sha = response.json()["sha"] if response.status_code == 200 else None
+        self._remember_sha(path, sha)
+        return sha
+
+    def _put(self, path, body, message, sha):
+        payload = {
+            "message": message,
+            "content": base64.b64encode(body.encode()).decode(),
+            "branch": self.branch
+        }
+        if sha:
+            payload["sha"] = sha
+        return self._request("PUT", path, json=payload)
+
+    def _stored(self, path, body, result):
+        if result.status_code not in [200, 201]:
+            self.cache.invalidate(path)
+            raise StorageError(result.text)
+
+        sha = result.json()["content"]["sha"]
+        self._remember_sha(path, sha)
+        # Nuestra propia escritura sustituye a la entrada cacheada (sin ETag hasta la próxima lectura)
+        self.cache.put(path, CacheEntry(body, None, sha))
+        return sha
+
+    def put(self, path, body, message):
+        """Escribir ``body`` en ``path`` usando el SHA conocido"""
+        result = self._put(path, body, message, self.known_sha(path))
+        if result.status_code in [409, 422]:
+            # SHA obsoleto o fichero creado por otro proceso: consultar y reintentar una vez
+            result = self._put(path, body, message, self._fetch_sha(path))
+        return self._stored(path, body, result)
+
+    def put_if(self, path, body, message, sha):
+        """Escribir ``body`` solo si el SHA actual de ``path`` es ``sha`` (None: solo si no existe)"""
+        result = self._put(path, body, message, sha)
+        if result.status_code in [409, 422]:
+            # La próxima lectura debe traer la versión actual, no la cacheada
+            self.cache.invalidate(path)
+            self._remember_sha(path, None)
+            raise ConflictError(path)
+        return self._stored(path, body, result)
+
+
+class GitHubStorage(StorageBackend):
+    """Documentos guardados en un repositorio mediante la Contents API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def load(self, name):
+        body = self.client.get(name)
+        return json.loads(body) if body is not None else None
+
+    def save(self, name, data, message):
+        self.client.put(name, json.dumps(data, indent=4), message)
+
+    def load_versioned(self, name):
+        body = self.client.get(name)
+        if body is None:
+            return None, None
+        return json.loads(body), self.client.known_sha(name)
+
+    def compare_and_swap(self, name, data, message, expected):
+        return self.client.put_if(name, json.dumps(data, indent=4), message, expected)
+
+
+class LocalStorage(StorageBackend):
+    """Documentos guardados como ficheros JSON en un directorio local"""
+
+    def __init__(self, root="."):
+        self.root = Path(root)
+
+    def load(self, name):
+        try:
+            with open(self.root / name, encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        # Vacío: otro proceso lo acaba de crear con compare_and_swap y aún no lo ha escrito
+        return json.loads(content) if content else None
+
+    def save(self, name, data, message):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Escribir en un temporal y renombrar para no dejar ficheros a medias
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise StorageError(str(e)) from e
+
+    def _create(self, name, data):
+        """Crear ``name`` solo si no existe, también frente a otros procesos"""
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = json.dumps(data, indent=4).encode("utf-8")
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+        except OSError as e:
+            os.unlink(path)
+            raise StorageError(str(e)) from e
+
+    def compare_and_swap(self, name, data, message, expected):
+        try:
+            if expected is None:
+                self._create(name, data)
+                return content_version(data)
+            path = self.root / name
+            # El bloqueo va en un fichero aparte: os.replace sustituye el del documento
+            with open(path.parent / f".{path.name}.lock", "a") as lock, self._cas_lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                _, version = self.load_versioned(name)
+                if version != expected:
+                    raise ConflictError(name)
+                self.save(name, data, message)
+        except FileExistsError:
+            raise ConflictError(name) from None
+        except OSError as e:
+            raise StorageError(str(e)) from e
+        return content_version(data)
+
+
+class SQLiteStorage(StorageBackend):
+    """Documentos guardados en una base de datos SQLite con escrituras transaccionales"""
+
+    def __init__(self, path="vacaciones.db"):
+        self.path = str(path)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " name TEXT PRIMARY KEY,"
+                " content TEXT NOT NULL,"
+                " message TEXT,"
+                " updated_at TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        # Una conexión por operación: Streamlit atiende cada sesión en su propio hilo
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def load(self, name):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT content FROM documents WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _upsert(self, conn, name, data, message):
+        conn.execute(
+            "INSERT INTO documents (name, content, message, updated_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET content = excluded.content,"
+            " message = excluded.message, updated_at = excluded.updated_at",
+            (name, json.dumps(data), message, datetime.now().isoformat())
+        )
+
+    def save(self, name, data, message):
+        try:
+            with closing(self._connect()) as conn, conn:
+                self._upsert(conn, name, data, message)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def compare_and_swap(self, name, data, message, expected):
+        try:
+            with closing(self._connect()) as conn:
+                # BEGIN IMMEDIATE bloquea la escritura entre la comprobación y el guardado
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT content FROM documents WHERE name = ?", (name,)).fetchone()
+                version = content_version(json.loads(row[0])) if row else None
+                if version != expected:
+                    conn.rollback()
+                    raise ConflictError(name)
+                self._upsert(conn, name, data, message)
+                conn.commit()
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        return content_version(data)
+
+
+class MirroredStorage(StorageBackend):
+    """Backend principal con copia opcional de las escrituras en otro backend.
+
+    El espejo recibe el documento tal como queda en el principal (con un
+    registro de cambios, el documento completo y no el evento).
+    """
+
+    def __init__(self, primary, mirror):
+        self.primary = primary
+        self.mirror = mirror
+
+    def load(self, name):
+        return self.primary.load(name)
+
+    def _mirror(self, name, message):
+        try:
+            data = self.primary.load(name)
+            if data is not None:
+                self.mirror.save(name, data, message)
+        except StorageError:
+            # El espejo es secundario: un fallo no invalida la escritura principal
+            pass
+
+    def save(self, name, data, message):
+        self.primary.save(name, data, message)
+        self._mirror(name, message)
+
+    def load_versioned(self, name):
+        return self.primary.load_versioned(name)
+
+    def compare_and_swap(self, name, data, message, expected):
+        version = self.primary.compare_and_swap(name, data, message, expected)
+        self._mirror(name, message)
+        return version
+
+
+def _setting(config, key, default=None):
+    """Leer un ajuste de la configuración (st.secrets) o del entorno"""
+    if config is not None and key in config:
+        return config[key]
+    return os.environ.get(key, default)
+
+
+def _github_from(config):
+    return GitHubStorage(GitHubClient(
+        token=_setting(config, "GITHUB_TOKEN"),
+        repo=_setting(config, "GITHUB_REPO"),
+        branch=_setting(config, "GITHUB_BRANCH", "main"),
+        api_url=_setting(config, "GITHUB_API_URL", GITHUB_API_URL),
+        cache=ReadCache(
+            ttl=float(_setting(config, "GITHUB_CACHE_TTL", 10)),
+            maxsize=int(_setting(config, "GITHUB_CACHE_SIZE", 256))
+        ),
+        pool_size=int(_setting(config, "GITHUB_POOL_SIZE", 16))
+    ))
+
+
+def get_storage(config=None):
+    """Crear el backend indicado por STORAGE_BACKEND (github, local o sqlite).
+
+    Con local y sqlite los documentos de vacaciones se guardan como registro
+    de cambios (``vacaciones.changelog``); en GitHub, enteros como siempre.
+    """
+    from .changelog import ChangeLogStorage
+
+    kind = str(_setting(config, "STORAGE_BACKEND", "github")).lower()
+    if kind == "github":
+        # Leer el registro costaría al menos una petición más por documento
+        return _github_from(config)
+    elif kind == "local":
+        backend = LocalStorage(_setting(config, "STORAGE_PATH", "."))
+    elif kind == "sqlite":
+        backend = SQLiteStorage(_setting(config, "STORAGE_PATH", "vacaciones.db"))
+    else:
+        raise ValueError(f"Backend de almacenamiento desconocido: {kind}")
+
+    backend = ChangeLogStorage(backend, compact_after=int(_setting(config, "CHANGELOG_COMPACT_AFTER", 50)))
+    if str(_setting(config, "STORAGE_MIRROR", "")).lower() == "github":
+        # Fuera del registro: GitHub guarda el documento completo en cada escritura
+        backend = MirroredStorage(backend, _github_from(config))
+    return backend
@@ -0,0 +1,297 @@
+"""Disponibilidad del equipo: los días de vacaciones de todos los usuarios en una matriz.
+
+``load_documents`` lee los documentos de todos los usuarios con un pool de
+hilos acotado (cada lectura es E/S; en GitHub, una petición).
+``TeamAvailability`` guarda de cada documento solo lo que necesita la vista
+del equipo y, por año, una matriz booleana usuarios × días del año. La matriz
+se construye con una sola asignación vectorizada; cuando cambia el documento
+de un usuario solo se recalcula su fila.
+
+``AbsenceIndex`` es el índice invertido fecha → usuarios de vacaciones ese día,
+para las consultas por fecha ("cuántos faltan el 14 de agosto", "qué días faltan
+más de N personas", "con quién coincide esta solicitud") sin recorrer los
+días de todos los usuarios.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .document import VacationDocument
+from .storage import StorageError, content_version
+
+# Campos del documento que usa la vista del equipo
+TEAM_FIELDS = ("full_name", "company", "workplace", "used_days")
+
+
+def _load_document(backend, username):
+    vacation_data = backend.load(f"vacation_data_{username}.json")
+    return VacationDocument.from_dict(vacation_data) if vacation_data is not None else None
+
+
+def load_documents(backend, usernames, workers=16):
+    """Documentos de vacaciones de ``usernames`` leídos y decodificados en paralelo: usuario → ``VacationDocument`` (o None)"""
+    usernames = list(usernames)
+    if not usernames:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(usernames)))) as pool:
+        documents = pool.map(lambda username: _load_document(backend, username), usernames)
+        return dict(zip(usernames, documents))
+
+
+def _summary(document):
+    summary = {field: getattr(document, field) for field in TEAM_FIELDS if field != "used_days"}
+    summary["used_days"] = document.used_days.to_iso()
+    return summary
+
+
+def _offsets(year, used_days):
+    """Posición en el año ``year`` de cada día de ``used_days`` (se descartan los de otros años)"""
+    import numpy as np
+
+    from .business_days import to_datetime64
+
+    offsets = (to_datetime64(used_days) - np.datetime64(f"{year:04d}-01-01", "D")).astype(np.int64)
+    return offsets[(offsets >= 0) & (offsets < _days_in_year(year))]
+
+
+def _iso(day):
+    return day if isinstance(day, str) else day.isoformat()
+
+
+def _days_in_year(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+class TeamYear:
+    """Matriz usuarios × días de un año: ``matrix[i, d]`` indica si ``usernames[i]`` tiene vacaciones el día ``d``.
+
+    Las actualizaciones sustituyen la matriz por una copia, así que quien
+    esté leyendo la anterior no ve una fila a medias.
+    """
+
+    __slots__ = ("year", "usernames", "index", "matrix")
+
+    def __init__(self, year, used_days):
+        import numpy as np
+
+        self.year = year
+        self.usernames = list(used_days)
+        self.index = {username: row for row, username in enumerate(self.usernames)}
+        self.matrix = np.zeros((len(self.usernames), _days_in_year(year)), dtype=bool)
+        if self.usernames:
+            offsets = [_offsets(year, days) for days in used_days.values()]
+            rows = np.repeat(np.arange(len(offsets)), [len(part) for part in offsets])
+            self.matrix[rows, np.concatenate(offsets)] = True
+
+    def set_row(self, username, used_days):
+        import numpy as np
+
+        row = np.zeros(self.matrix.shape[1], dtype=bool)
+        row[_offsets(self.year, used_days)] = True
+        index = self.index.get(username)
+        if index is None:
+            self.matrix = np.vstack([self.matrix, row])
+            self.index = dict(self.index, **{username: len(self.usernames)})
+            self.usernames = self.usernames + [username]
+        else:
+            matrix = self.matrix.copy()
+            matrix[index] = row
+            self.matrix = matrix
+
+    def between(self, start, end, usernames=None):
+        """``(usuarios, submatriz)`` de los días en ``[start, end)``, opcionalmente solo de ``usernames``"""
+        first = max(0, (start - date(self.year, 1, 1)).days)
+        last = min(self.matrix.shape[1], (end - date(self.year, 1, 1)).days)
+        matrix, index = self.matrix, self.index
+        if usernames is None:
+            return list(self.usernames), matrix[:, first:last]
+        selected = [username for username in usernames if username in index]
+        return selected, matrix[[index[username] for username in selected], first:last]
+
+
+class AbsenceIndex:
+    """Índice invertido fecha ISO → usuarios de vacaciones ese día.
+
+    ``update`` aplica solo la diferencia con los días anteriores del usuario.
+    Cada fecha guarda un ``frozenset`` que se sustituye al cambiar, así que
+    las consultas no necesitan bloqueo. Los parámetros ``among`` limitan el
+    resultado a un conjunto de usuarios (p. ej. los de una empresa).
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._days = {}
+
+    def update(self, username, used_days):
+        self.update_many([(username, used_days)])
+
+    def update_many(self, changes):
+        """Aplicar ``[(usuario, días)]``; cada fecha afectada se reconstruye una sola vez"""
+        added, removed = {}, {}
+        for username, used_days in changes:
+            new = frozenset(used_days)
+            old = self._days.get(username, frozenset())
+            for day in old - new:
+                removed.setdefault(day, set()).add(username)
+            for day in new - old:
+                added.setdefault(day, set()).add(username)
+            self._days[username] = new
+        for day in removed.keys() | added.keys():
+            users = (self._users.get(day, frozenset()) - removed.get(day, set())) | added.get(day, set())
+            if users:
+                self._users[day] = frozenset(users)
+            else:
+                self._users.pop(day, None)
+
+    def _on(self, day, among):
+        users = self._users.get(_iso(day), frozenset())
+        return users if among is None else users & among
+
+    def count(self, day, among=None):
+        """Número de usuarios de vacaciones el día ``day``"""
+        return len(self._on(day, among))
+
+    def busy_days(self, start, end, threshold, among=None, workdays_only=True):
+        """Días de ``[start, end]`` con más de ``threshold`` usuarios de vacaciones: ``[(fecha, número)]``"""
+        busy = []
+        day = start
+        while day <= end:
+            if not workdays_only or day.weekday() < 5:
+                count = len(self._on(day, among))
+                if count > threshold:
+                    busy.append((day, count))
+            day += timedelta(days=1)
+        return busy
+
+    def overlaps(self, username, days, among=None):
+        """Otros usuarios de vacaciones en cada uno de ``days``: ``{día: [usuarios]}`` (solo días con coincidencias)"""
+        result = {}
+        for day in days:
+            users = self._on(day, among) - {username}
+            if users:
+                result[day] = sorted(users)
+        return result
+
+
+class TeamAvailability:
+    """Resumen de los documentos de todos los usuarios y sus matrices por año, compartido por las sesiones.
+
+    ``refresh`` relee todos los documentos como mucho cada ``max_age``
+    segundos; entretanto ``update`` incorpora los cambios guardados en este
+    proceso. En ambos casos solo se recalculan las filas (y las entradas de
+    ``index``) de los usuarios cuyo documento ha cambiado. Las lecturas de
+    ``refresh`` se hacen sin bloquear ``update``.
+    """
+
+    def __init__(self, backend, workers=16, max_age=900):
+        self.backend = backend
+        self.workers = workers
+        self.max_age = max_age
+        self._summaries = {}
+        self._versions = {}
+        self._years = {}
+        self.index = AbsenceIndex()
+        self._loaded_at = float("-inf")
+        # Último ``update`` de cada usuario: una carga anterior no lo sobrescribe
+        self._updated_at = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Error de la última carga en segundo plano (None si fue bien)
+        self.error = None
+
+    @property
+    def loaded(self):
+        """Si ya se ha hecho alguna carga completa"""
+        return self._loaded_at > float("-inf")
+
+    def refresh(self, usernames, max_age=None, blocking=True):
+        """Releer los documentos de ``usernames`` si los datos tienen más de ``max_age`` segundos.
+
+        Si otra sesión ya está releyéndolos, espera a que termine o, con
+        ``blocking=False``, vuelve enseguida con los datos que haya.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        # Varias sesiones a la vez hacen una sola carga
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return False
+        try:
+            if time.monotonic() - self._loaded_at < max_age:
+                return False
+            started = time.monotonic()
+            documents = load_documents(self.backend, usernames, self.workers)
+            with self._lock:
+                changed = [
+                    (username, self._summaries[username]["used_days"])
+                    for username, document in documents.items()
+                    if document is not None
+                    and self._updated_at.get(username, float("-inf")) < started
+                    and self._update(username, document)
+                ]
+                self.index.update_many(changed)
+                self._loaded_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+        return True
+
+    def refresh_in_background(self, usernames, max_age=None):
+        """Como ``refresh``, pero en un hilo aparte y sin esperar; no hace nada si ya hay una carga en curso"""
+        max_age = self.max_age if max_age is None else max_age
+        if time.monotonic() - self._loaded_at < max_age or self._refresh_lock.locked():
+            return
+        thread = threading.Thread(target=self._refresh_quietly, args=(list(usernames), max_age), daemon=True)
+        thread.start()
+
+    def _refresh_quietly(self, usernames, max_age):
+        try:
+            self.refresh(usernames, max_age, blocking=False)
+            self.error = None
+        except Exception as e:
+            self.error = str(e) if isinstance(e, StorageError) else repr(e)
+
+    def update(self, username, document):
+        """Incorporar el ``VacationDocument`` de un usuario; devuelve False si no había cambiado"""
+        with self._lock:
+            self._updated_at[username] = time.monotonic()
+            if not self._update(username, document):
+                return False
+            self.index.update(username, self._summaries[username]["used_days"])
+            return True
+
+    def _update(self, username, document):
+        summary = _summary(document)
+        version = content_version(summary)
+        if self._versions.get(username) == version:
+            return False
+        self._summaries[username] = summary
+        self._versions[username] = version
+        for team_year in self._years.values():
+            team_year.set_row(username, summary["used_days"])
+        return True
+
+    def year(self, year):
+        """Matriz del año ``year``; se construye la primera vez que se pide"""
+        with self._lock:
+            team_year = self._years.get(year)
+            if team_year is None:
+                used_days = {username: summary["used_days"] for username, summary in self._summaries.items()}
+                team_year = self._years[year] = TeamYear(year, used_days)
+            return team_year
+
+    def summary(self, username):
+        """Nombre, empresa, centro y días del usuario (vacío si no se ha cargado)"""
+        return self._summaries.get(username, {})
+
+    def colleagues(self, username):
+        """Usuarios de la misma empresa que ``username``, sin él"""
+        company = self.summary(username).get("company")
+        return {other for other, summary in dict(self._summaries).items() if summary.get("company") == company} - {username}
+
+    def members(self, company=None):
+        """Usuarios cargados, opcionalmente solo los de ``company``, ordenados por nombre"""
+        summaries = dict(self._summaries)
+        selected = [
+            username for username, summary in summaries.items()
+            if company is None or summary.get("company") == company
+        ]
+        return sorted(selected, key=lambda username: (summaries[username].get("full_name") or username).lower())
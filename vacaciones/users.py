@@ -0,0 +1,170 @@
+"""Registro de usuarios repartido en un fichero por usuario más un índice compacto.
+
+``users/<usuario>.json`` guarda la ficha completa de cada usuario y
+``users/index.json`` solo el hash de la contraseña de cada uno. Un alta
+escribe su ficha y añade una entrada al índice; una edición de datos
+personales solo reescribe la ficha del usuario. Ambas escrituras usan
+compare-and-swap y, ante un conflicto, releen, combinan y reintentan.
+"""
+import hashlib
+import hmac
+import threading
+import time
+
+from .storage import ConflictError
+
+LEGACY_USERS_FILE = "users.json"
+INDEX_FILE = "users/index.json"
+
+
+def hash_password(password):
+    """Hash de la contraseña usando SHA-256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def shard_name(username):
+    return f"users/{username}.json"
+
+
+def validate_username(username):
+    """Comprobar que el usuario puede usarse como nombre de fichero"""
+    if not username or username.startswith(".") or any(c in username for c in '/\\:'):
+        raise ValueError(f"Nombre de usuario no válido: {username!r}")
+
+
+class UserRegistry:
+    """Altas, consultas y ediciones de usuarios sobre un backend de almacenamiento"""
+
+    def __init__(self, backend, retries=5):
+        self.backend = backend
+        self.retries = retries
+
+    def _legacy_users(self):
+        return self.backend.load(LEGACY_USERS_FILE) or {}
+
+    def _ensure_migrated(self):
+        """Repartir users.json en fichas individuales la primera vez que se escribe"""
+        if self.backend.load(INDEX_FILE) is not None:
+            return
+        legacy = self._legacy_users()
+        for username, record in legacy.items():
+            try:
+                self.backend.compare_and_swap(shard_name(username), record, f"🔄 Migración de {username}", None)
+            except ConflictError:
+                pass
+        self._merge_index({username: record["password"] for username, record in legacy.items()})
+
+    def _merge_index(self, entries):
+        for _ in range(self.retries):
+            index, version = self.backend.load_versioned(INDEX_FILE)
+            index = dict(index or {})
+            index.update(entries)
+            try:
+                self.backend.compare_and_swap(INDEX_FILE, index, "🔄 Actualización del índice de usuarios", version)
+                return
+            except ConflictError:
+                continue
+        raise ConflictError(INDEX_FILE)
+
+    def passwords(self):
+        """Diccionario usuario → hash de contraseña"""
+        return self.passwords_versioned()[0]
+
+    def passwords_versioned(self):
+        """``(usuario → hash de contraseña, versión del índice)``"""
+        index, version = self.backend.load_versioned(INDEX_FILE)
+        if index is None:
+            legacy, version = self.backend.load_versioned(LEGACY_USERS_FILE)
+            index = {username: record["password"] for username, record in (legacy or {}).items()}
+        return index, version
+
+    def get(self, username):
+        """Ficha del usuario o None si no existe"""
+        try:
+            validate_username(username)
+        except ValueError:
+            return None
+        record = self.backend.load(shard_name(username))
+        if record is None and self.backend.load(INDEX_FILE) is None:
+            record = self._legacy_users().get(username)
+        return record
+
+    def create(self, username, record):
+        """Dar de alta un usuario; devuelve False si ya existe"""
+        validate_username(username)
+        self._ensure_migrated()
+        try:
+            self.backend.compare_and_swap(shard_name(username), record, f"👤 Alta de {username}", None)
+        except ConflictError:
+            return False
+        self._merge_index({username: record["password"]})
+        return True
+
+    def update(self, username, changes):
+        """Actualizar campos de la ficha de un usuario existente"""
+        validate_username(username)
+        self._ensure_migrated()
+        for _ in range(self.retries):
+            record, version = self.backend.load_versioned(shard_name(username))
+            if record is None:
+                return False
+            record = dict(record, **changes)
+            try:
+                self.backend.compare_and_swap(shard_name(username), record, f"🔄 Datos de {username}", version)
+            except ConflictError:
+                continue
+            if "password" in changes:
+                self._merge_index({username: changes["password"]})
+            return True
+        raise ConflictError(shard_name(username))
+
+
+class CredentialIndex:
+    """Índice en memoria usuario → hash de contraseña compartido por todas las sesiones.
+
+    Se revalida contra el almacenamiento como mucho cada ``ttl`` segundos y
+    solo se reconstruye si cambió la versión (SHA) del índice. Un usuario
+    desconocido fuerza una revalidación como mucho cada ``miss_interval``
+    segundos, de modo que una ráfaga de intentos fallidos no genera peticiones.
+    """
+
+    def __init__(self, registry, ttl=60, miss_interval=5):
+        self.registry = registry
+        self.ttl = ttl
+        self.miss_interval = miss_interval
+        self._passwords = {}
+        self._version = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, max_age=None):
+        """Revalidar el índice si tiene más de ``max_age`` segundos (``ttl`` por defecto)"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if time.monotonic() - self._checked_at < max_age:
+                return
+            passwords, version = self.registry.passwords_versioned()
+            if version != self._version or version is None:
+                self._passwords = dict(passwords)
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def usernames(self):
+        """Usuarios registrados, ordenados"""
+        self.refresh()
+        return sorted(self._passwords)
+
+    def check(self, username, password_hash):
+        """Comprobar las credenciales sin acceder al almacenamiento en el caso habitual"""
+        self.refresh()
+        stored = self._passwords.get(username)
+        if stored is None:
+            # Puede ser un alta hecha desde otro proceso
+            self.refresh(max_age=self.miss_interval)
+            stored = self._passwords.get(username)
+        return stored is not None and hmac.compare_digest(stored, password_hash)
+
+    def add(self, username, password_hash):
+        """Registrar en el índice local un alta hecha en este proceso"""
+        with self._lock:
+            self._passwords = dict(self._passwords, **{username: password_hash})
@@ -0,0 +1,113 @@
+"""Escritura diferida: agrupa cambios rápidos sobre un documento en una sola escritura"""
+import atexit
+import copy
+import threading
+
+from .storage import StorageError
+
+# Espera máxima, en segundos, entre reintentos de una escritura que ha fallado
+MAX_RETRY_DELAY = 300.0
+
+
+class PendingWrite:
+    """Última versión de un documento pendiente de guardar"""
+
+    __slots__ = ("data", "message", "timer", "failures")
+
+    def __init__(self, data, message):
+        self.data = data
+        self.message = message
+        self.timer = None
+        self.failures = 0
+
+
+class WriteBehindBuffer:
+    """Buffer de escrituras por documento con ventana de espera (debounce).
+
+    Cada ``stage`` sustituye la versión pendiente y reinicia el temporizador;
+    cuando pasan ``delay`` segundos sin cambios se guarda una sola vez. Con
+    ``delay`` igual a 0 las escrituras se hacen en el momento.
+
+    La versión pendiente sigue disponible en ``get`` mientras se guarda y solo
+    se retira cuando el backend confirma la escritura; si falla, se reintenta
+    con esperas cada vez más largas (hasta ``MAX_RETRY_DELAY``).
+    """
+
+    def __init__(self, backend, delay=3.0):
+        self.backend = backend
+        self.delay = delay
+        self.errors = {}
+        self._pending = {}
+        # Un guardado a la vez por documento (temporizador y "Guardar ahora")
+        self._flush_locks = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush_all)
+
+    def stage(self, name, data, message):
+        """Dejar ``data`` pendiente de guardar en ``name``"""
+        if self.delay <= 0:
+            self.backend.save(name, data, message)
+            return
+
+        pending = PendingWrite(copy.deepcopy(data), message)
+        with self._lock:
+            previous = self._pending.get(name)
+            if previous is not None:
+                previous.timer.cancel()
+            self._pending[name] = pending
+            self.errors.pop(name, None)
+            self._schedule(name, pending, self.delay)
+
+    def _schedule(self, name, pending, delay):
+        # Con self._lock tomado
+        pending.timer = threading.Timer(delay, self._flush_quietly, args=(name,))
+        pending.timer.daemon = True
+        pending.timer.start()
+
+    def get(self, name):
+        """Copia de la versión pendiente de ``name`` o None si no hay cambios sin guardar"""
+        with self._lock:
+            pending = self._pending.get(name)
+            return copy.deepcopy(pending.data) if pending is not None else None
+
+    def is_pending(self, name):
+        with self._lock:
+            return name in self._pending
+
+    def flush(self, name):
+        """Guardar ya los cambios pendientes de ``name``; lanza StorageError si falla"""
+        with self._lock:
+            flush_lock = self._flush_locks.setdefault(name, threading.Lock())
+        with flush_lock:
+            with self._lock:
+                pending = self._pending.get(name)
+                if pending is None:
+                    return
+                pending.timer.cancel()
+
+            try:
+                self.backend.save(name, pending.data, pending.message)
+            except Exception:
+                with self._lock:
+                    # Reintentar salvo que ya haya una versión más reciente (con su propio temporizador)
+                    if self._pending.get(name) is pending:
+                        pending.failures += 1
+                        self._schedule(name, pending, min(max(self.delay, 1.0) * 2 ** pending.failures, MAX_RETRY_DELAY))
+                raise
+            with self._lock:
+                # Hasta aquí ``get`` ha seguido devolviendo esta versión
+                if self._pending.get(name) is pending:
+                    del self._pending[name]
+                self.errors.pop(name, None)
+
+    def _flush_quietly(self, name):
+        try:
+            self.flush(name)
+        except Exception as e:
+            self.errors[name] = str(e) if isinstance(e, StorageError) else repr(e)
+
+    def flush_all(self):
+        with self._lock:
+            names = list(self._pending)
+        for name in names:
+            self._flush_quietly(name)